@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+
+import slchat
+from slchat.testing import LocalServer, wait_until
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def report(label, value, unit):
+    print(f"{label:<40} {value:>12.2f} {unit}")
+
+
+async def start_bot(server, **kwargs):
+    bot = slchat.Bot(prefix="!", base_url=server.base_url, **kwargs)
+    ready = asyncio.Event()
+
+    @bot.event
+    async def on_ready():
+        ready.set()
+
+    start = time.perf_counter()
+    task = asyncio.ensure_future(bot.run("token", "bot"))
+    await asyncio.wait_for(ready.wait(), 120)
+    return bot, task, time.perf_counter() - start
+
+
+async def stop_bot(bot, task):
+    await bot.close()
+    await task
+
+
+def populate(server, chats, members):
+    server.add_user("bot", bot=True)
+    for index in range(members):
+        server.add_user(f"user{index}")
+    for index in range(chats):
+        server.add_server(f"server{index}", members=["bot"] + [f"user{(index + offset) % members}" for offset in range(min(members, 10))])
+
+
+async def bench_startup(chats, pool_size):
+    async with LocalServer() as server:
+        populate(server, chats, max(chats, 10))
+        bot, task, elapsed = await start_bot(server, pool_size=pool_size)
+        label = "per-chat sockets" if pool_size is None else f"{pool_size} multiplexed sockets"
+        report(f"startup, {chats} chats ({label})", elapsed * 1000, "ms")
+        await stop_bot(bot, task)
+
+
+async def bench_memory(chats, users):
+    async with LocalServer() as server:
+        populate(server, chats, 10)
+        bot, task, _ = await start_bot(server, pool_size=1)
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for index in range(users):
+            bot._users.intern({"id": f"cached{index}", "name": f"cached{index}", "avatar": "", "status": "online",
+                               "badges": [], "servers": [], "dms": []})
+        report(f"memory per cached user ({users} users)", (tracemalloc.get_traced_memory()[0] - before) / users, "bytes")
+        tracemalloc.stop()
+
+        for chat_id in list(bot.connections.channels):
+            await bot.connections.disconnect(chat_id)
+        bot._servers.clear()
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for chat_id in server.servers:
+            await bot.connect_to_chat(chat_id, "server")
+        await wait_until(lambda: len(bot._servers) == chats)
+        gc.collect()
+        report(f"memory per joined chat ({chats} chats)", (tracemalloc.get_traced_memory()[0] - before) / chats, "bytes")
+        tracemalloc.stop()
+        await stop_bot(bot, task)
+
+
+async def bench_commands(count):
+    async with LocalServer() as server:
+        populate(server, 1, 10)
+        bot, task, _ = await start_bot(server)
+        handled = 0
+
+        @bot.command()
+        async def ping(ctx, amount: int, *, text):
+            nonlocal handled
+            handled += 1
+
+        message = {"id": "1", "owner": "user0", "text": "!ping 3 hello &amp; world", "date": 0}
+        start = time.perf_counter()
+        for _ in range(count):
+            await bot.message_receive(message, "server0")
+        report(f"in-process commands ({count})", count / (time.perf_counter() - start), "cmd/s")
+
+        handled = 0
+        start = time.perf_counter()
+        for index in range(count):
+            await server.send_message("server0", f"user{index % 10}", "!ping 3 hello & world")
+        await wait_until(lambda: handled == count, timeout=120)
+        report(f"socket commands ({count})", count / (time.perf_counter() - start), "cmd/s")
+        await stop_bot(bot, task)
+
+
+async def bench_sends(count, window):
+    async with LocalServer() as server:
+        populate(server, 1, 10)
+        bot, task, _ = await start_bot(server, send_rate=1e9, send_burst=count, send_window=window)
+        latencies = []
+
+        async def send(index):
+            start = time.perf_counter()
+            result = await bot.send(f"message {index}", "server0")
+            if result is not None:
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(index) for index in range(count)))
+        elapsed = time.perf_counter() - start
+        report(f"confirmed sends ({count}, window {window})", len(latencies) / elapsed, "msg/s")
+        report("send confirmation latency p50", percentile(latencies, 0.5) * 1000, "ms")
+        report("send confirmation latency p99", percentile(latencies, 0.99) * 1000, "ms")
+        report("send confirmation latency mean", statistics.fmean(latencies) * 1000 if latencies else 0, "ms")
+        await stop_bot(bot, task)
+
+
+async def run(args):
+    for pool_size in (None, args.pool_size):
+        await bench_startup(args.chats, pool_size)
+    await bench_memory(args.chats, args.users)
+    await bench_commands(args.commands)
+    await bench_sends(args.sends, args.window)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark slchat.py against a local stand-in server.")
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--commands", type=int, default=5000)
+    parser.add_argument("--sends", type=int, default=2000)
+    parser.add_argument("--window", type=int, default=64)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
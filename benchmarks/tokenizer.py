@@ -0,0 +1,58 @@
+import shlex
+import timeit
+
+from slchat.classes.command import Signature
+from slchat.tokenizer import split, next_token
+
+
+SAMPLES = [
+    "ping",
+    "ban 1234567890 spamming in general",
+    'say "hello world" to everyone',
+    "echo it's a quote-heavy 'message' with \"mixed\" quoting and a \\ escape",
+    "roll 2d6 + 4",
+    "remind 10m " + "lorem ipsum dolor sit amet " * 20,
+]
+
+
+async def say(ctx, *, text):
+    pass
+
+
+def shlex_dispatch(raw):
+    parts = shlex.split(raw)
+    parts.pop(0)
+    return " ".join(parts)
+
+
+def tokenizer_dispatch(raw, signature=Signature(say)):
+    name, pos = next_token(raw)
+    return signature.bind(None, raw[pos:], name)
+
+
+def bench(label, func, number):
+    for sample in SAMPLES:
+        try:
+            seconds = timeit.timeit(lambda: func(sample), number=number)
+        except ValueError:
+            print(f"{label:<12} {sample[:32]!r:<36} error")
+            continue
+        print(f"{label:<12} {sample[:32]!r:<36} {seconds / number * 1e6:8.2f} us")
+
+
+def main(number=20000):
+    for sample in SAMPLES:
+        try:
+            assert split(sample) == shlex.split(sample), sample
+        except ValueError:
+            pass
+    print("split")
+    bench("shlex", shlex.split, number)
+    bench("tokenizer", split, number)
+    print("\ndispatch (command name + rest of text)")
+    bench("shlex", shlex_dispatch, number)
+    bench("tokenizer", tokenizer_dispatch, number)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,3 @@
 from slchat.client import *
-from slchat.classes import *
\ No newline at end of file
+from slchat.classes import *
+from slchat.models import Struct, User, Server, DM
\ No newline at end of file
@@ -0,0 +1,86 @@
+import asyncio
+
+
+class BulkResult:
+    __slots__ = ("target", "status", "value")
+
+    def __init__(self, target, status, value=None):
+        self.target = target
+        self.status = status
+        self.value = value
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+    def __repr__(self):
+        return f"BulkResult(target={self.target!r}, status={self.status!r}, value={self.value!r})"
+
+
+class BulkOperation:
+    def __init__(self, targets, func, concurrency=None):
+        self._targets = targets
+        self._func = func
+        self._semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        self._queue = None
+        self._tasks = []
+        self._remaining = 0
+
+    def _start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        for target in self._targets:
+            task = asyncio.ensure_future(self._run(target))
+            task.add_done_callback(lambda task, target=target: self._done(target, task))
+            self._tasks.append(task)
+        self._remaining = len(self._tasks)
+
+    def _done(self, target, task):
+        if task.cancelled():
+            self._queue.put_nowait(BulkResult(target, "cancelled"))
+
+    async def _run(self, target):
+        try:
+            if self._semaphore is None:
+                status, value = await self._func(target)
+            else:
+                async with self._semaphore:
+                    status, value = await self._func(target)
+        except Exception as e:
+            status, value = "error", e
+        self._queue.put_nowait(BulkResult(target, status, value))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        self._start()
+        if not self._remaining:
+            raise StopAsyncIteration
+        try:
+            result = await self._queue.get()
+        except BaseException:
+            self.cancel()
+            raise
+        self._remaining -= 1
+        return result
+
+    def __await__(self):
+        return self.results().__await__()
+
+    async def results(self):
+        return [result async for result in self]
+
+    def cancel(self):
+        self._start()
+        for task in self._tasks:
+            task.cancel()
+
+    async def __aenter__(self):
+        self._start()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,173 @@
+import time
+import weakref
+from collections import OrderedDict
+
+from slchat.models import User
+
+
+class UserCache:
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._expires = {}
+        self._live = weakref.WeakValueDictionary()
+        self._expired = weakref.WeakSet()
+        self.pinned = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._users)
+
+    def __iter__(self):
+        return iter(list(self._users))
+
+    def __contains__(self, user_id):
+        return self._lookup(user_id) is not None
+
+    def __getitem__(self, user_id):
+        user = self._lookup(user_id)
+        if user is None:
+            raise KeyError(user_id)
+        return user
+
+    def __setitem__(self, user_id, user):
+        self._insert(user_id, user)
+
+    def __delitem__(self, user_id):
+        del self._users[user_id]
+        self._expires.pop(user_id, None)
+        self._live.pop(user_id, None)
+
+    def get(self, user_id, default=None):
+        user = self._lookup(user_id)
+        if user is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return user
+
+    def pop(self, user_id, default=None):
+        user = self._users.pop(user_id, None)
+        self._expires.pop(user_id, None)
+        self._live.pop(user_id, None)
+        return default if user is None else user
+
+    def release(self, user_id):
+        if user_id in self.pinned:
+            return self._users.get(user_id)
+        user = self._users.pop(user_id, None)
+        self._expires.pop(user_id, None)
+        return user if user is not None else self._live.get(user_id)
+
+    def values(self):
+        return list(self._users.values())
+
+    def items(self):
+        return list(self._users.items())
+
+    def pin(self, user_id):
+        self.pinned.add(user_id)
+
+    def intern(self, data):
+        if isinstance(data, User):
+            user_id = data.id
+            existing = self._lookup(user_id, fresh=False)
+            if existing is None or existing is data:
+                self._insert(user_id, data)
+                return data
+            existing.update(dict(data.items()))
+            self._insert(user_id, existing)
+            return existing
+        user_id = data["id"]
+        existing = self._lookup(user_id, fresh=False)
+        if existing is not None:
+            existing.update(data)
+            self._insert(user_id, existing)
+            return existing
+        user = User(**data)
+        self._insert(user_id, user)
+        return user
+
+    def stats(self):
+        return {
+            "size": len(self._users),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _lookup(self, user_id, fresh=True):
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._live.get(user_id)
+            if user is None or fresh and user in self._expired:
+                return None
+            self._insert(user_id, user)
+            return user
+        if fresh and self.ttl is not None and self._expires[user_id] < time.monotonic() and user_id not in self.pinned:
+            self._evict(user_id)
+            self._expired.add(user)
+            return None
+        self._users.move_to_end(user_id)
+        return user
+
+    def _insert(self, user_id, user):
+        self._users[user_id] = user
+        self._users.move_to_end(user_id)
+        self._live[user_id] = user
+        self._expired.discard(user)
+        if self.ttl is not None:
+            self._expires[user_id] = time.monotonic() + self.ttl
+        if self.max_size is not None:
+            self._trim()
+
+    def _evict(self, user_id):
+        del self._users[user_id]
+        self._expires.pop(user_id, None)
+        self.evictions += 1
+
+    def _trim(self):
+        skipped = 0
+        while len(self._users) > self.max_size and skipped < len(self._users):
+            user_id = next(iter(self._users))
+            if user_id in self.pinned:
+                self._users.move_to_end(user_id)
+                skipped += 1
+                continue
+            self._evict(user_id)
+
+
+class MembershipIndex:
+    def __init__(self):
+        self._servers = {}
+
+    def servers_of(self, user_id):
+        return self._servers.get(user_id, set())
+
+    def add(self, server_id, user_id):
+        servers = self._servers.get(user_id)
+        if servers is None:
+            servers = self._servers[user_id] = set()
+        servers.add(server_id)
+
+    def remove(self, server_id, user_id):
+        servers = self._servers.get(user_id)
+        if servers is not None:
+            servers.discard(server_id)
+            if not servers:
+                del self._servers[user_id]
+
+    def set_members(self, server_id, before, members):
+        if before is not None:
+            for user_id in before.ids() - members.ids():
+                self.remove(server_id, user_id)
+        for user_id in members.ids():
+            self.add(server_id, user_id)
+
+    def drop_server(self, server_id, members):
+        for user_id in list(members.ids()):
+            self.remove(server_id, user_id)
@@ -1,4 +1,6 @@
 from slchat.classes.embed import Embed
 from slchat.classes.typing import TypingIndicator
+from slchat.classes.converter import Converter, UserConverter, register_converter
+from slchat.classes.cooldown import Cooldown
 from slchat.classes.command import Command, Group
 from slchat.classes.context import Context
\ No newline at end of file
@@ -1,35 +1,166 @@
+import inspect
+
+import time
+
+from slchat.classes.converter import build_converter
+from slchat.classes.cooldown import as_cooldowns
+from slchat.executor import check_execution
+from slchat.tokenizer import TokenizeError, next_token, split, rest
+
+
+class Signature:
+    __slots__ = ("positional", "var_positional", "keyword_only", "required", "rest")
+
+    def __init__(self, func):
+        self.positional = []
+        self.var_positional = None
+        self.keyword_only = []
+        self.required = 0
+        params = list(inspect.signature(func).parameters.values())[1:]
+        for p in params:
+            converter = build_converter(p.annotation, p.name)
+            if p.kind == p.VAR_POSITIONAL:
+                self.var_positional = (converter,)
+                break
+            elif p.kind == p.POSITIONAL_ONLY or p.kind == p.POSITIONAL_OR_KEYWORD:
+                self.positional.append((converter, p.default))
+                if p.default is inspect._empty:
+                    self.required += 1
+            elif p.kind == p.KEYWORD_ONLY:
+                self.keyword_only.append((p.name, f"{p.name}=", converter, p.default))
+        self.rest = self.var_positional is None and len(self.keyword_only) == 1
+
+    def bind(self, ctx, text, command_name):
+        if self.rest:
+            return self._bind_rest(ctx, text, command_name)
+
+        parts = split(text)
+        if len(parts) < self.required:
+            raise ValueError(f"Missing arguments for command: {command_name}")
+
+        args = []
+        kwargs = {}
+        idx = 0
+        for converter, default in self.positional:
+            if idx < len(parts):
+                value = parts[idx]
+                idx += 1
+                args.append(converter(ctx, value) if converter else value)
+            else:
+                args.append(default)
+
+        if self.var_positional is not None:
+            converter = self.var_positional[0]
+            args.extend(parts[idx:] if converter is None else (converter(ctx, value) for value in parts[idx:]))
+            return args, kwargs
+
+        if not self.keyword_only:
+            return args, kwargs
+
+        leftover = parts[idx:]
+        unmatched = []
+        for param in self.keyword_only:
+            name, prefix, converter, default = param
+            match = next((part for part in leftover if part.startswith(prefix)), None)
+            if match:
+                leftover.remove(match)
+                value = match[len(prefix):]
+                kwargs[name] = converter(ctx, value) if converter else value
+            else:
+                unmatched.append(param)
+
+        remaining_text = " ".join(leftover)
+        for name, prefix, converter, default in unmatched:
+            if remaining_text:
+                kwargs[name] = converter(ctx, remaining_text) if converter else remaining_text
+                remaining_text = ""
+            elif default is not inspect._empty:
+                kwargs[name] = default
+            else:
+                raise ValueError(f"Missing required keyword-only argument for command: {name}")
+        return args, kwargs
+
+    def _bind_rest(self, ctx, text, command_name):
+        args = []
+        pos = 0
+        for converter, default in self.positional:
+            token, end = next_token(text, pos)
+            if token is None:
+                if default is inspect._empty:
+                    raise ValueError(f"Missing arguments for command: {command_name}")
+                args.append(default)
+                continue
+            pos = end
+            args.append(converter(ctx, token) if converter else token)
+
+        name, prefix, converter, default = self.keyword_only[0]
+        remaining_text = text[pos:]
+        if prefix in remaining_text:
+            try:
+                match = next((part for part in split(remaining_text) if part.startswith(prefix)), None)
+            except TokenizeError:
+                match = None
+            if match is not None:
+                value = match[len(prefix):]
+                return args, {name: converter(ctx, value) if converter else value}
+        remaining_text = rest(remaining_text)
+        if remaining_text:
+            return args, {name: converter(ctx, remaining_text) if converter else remaining_text}
+        if default is not inspect._empty:
+            return args, {name: default}
+        raise ValueError(f"Missing required keyword-only argument for command: {name}")
+
+
 class Command:
-    def __init__(self, name, func=None, description="", aliases=None, alias_of=None):
+    def __init__(self, name, func=None, description="", aliases=None, alias_of=None, execution="loop", cooldown=None):
         self.name = name
         self.func = func
         self.description = description
         self.aliases = aliases or []
         self.alias_of = alias_of
+        self.execution = execution
+        self.cooldowns = as_cooldowns(cooldown)
+        self.signature = None
+        if func:
+            check_execution(func, execution)
+            self.signature = Signature(func)
+
+    def check_cooldowns(self, ctx):
+        now = time.monotonic()
+        for cooldown in self.cooldowns:
+            retry_after = cooldown.retry_after(ctx, now)
+            if retry_after:
+                return cooldown, retry_after
+        for cooldown in self.cooldowns:
+            cooldown.consume(ctx, now)
+        return None, 0.0
 
 
 class Group(Command):
-    def __init__(self, name, func=None, description="", aliases=None, alias_of=None, invoke_without_command=False):
-        super().__init__(name, func, description, aliases, alias_of)
+    def __init__(self, name, func=None, description="", aliases=None, alias_of=None, invoke_without_command=False, cooldown=None):
+        super().__init__(name, func, description, aliases, alias_of, cooldown=cooldown)
         self.invoke_without_command = invoke_without_command
         self.subcommands = {}
 
-    def command(self, *, name=None, description="", aliases=None):
+    def command(self, *, name=None, description="", aliases=None, execution="loop", cooldown=None):
         def decorator(func):
             command_name = name or func.__name__
-            self.subcommands[command_name] = Command(command_name, func, description, aliases)
+            cooldowns = as_cooldowns(cooldown)
+            self.subcommands[command_name] = Command(command_name, func, description, aliases, None, execution, cooldowns)
             if aliases:
                 for alias in aliases:
-                    self.subcommands[alias] = Command(alias, func, description, None, command_name)
+                    self.subcommands[alias] = Command(alias, func, description, None, command_name, execution, cooldowns)
             return func
         return decorator
 
-    def group(self, *, name=None, description="", aliases=None, invoke_without_command=False):
+    def group(self, *, name=None, description="", aliases=None, invoke_without_command=False, cooldown=None):
         def decorator(func):
             group_name = name or func.__name__
-            group = Group(group_name, func, description, aliases, None, invoke_without_command)
+            cooldowns = as_cooldowns(cooldown)
+            group = Group(group_name, func, description, aliases, None, invoke_without_command, cooldowns)
             self.subcommands[group_name] = group
             if aliases:
                 for alias in aliases:
-                    self.subcommands[alias] = Group(alias, func, description, None, group_name, invoke_without_command)
+                    self.subcommands[alias] = Group(alias, func, description, None, group_name, invoke_without_command, cooldowns)
             return group
-        return decorator
\ No newline at end of file
+        return decorator
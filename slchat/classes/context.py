@@ -1,32 +1,83 @@
+import html
+
 from slchat.classes import TypingIndicator
 
 
+_UNSET = object()
+
+
+def unescape(text):
+    if text and "&" in text:
+        return html.unescape(text)
+    return text
+
+
 class Context:
-    def __init__(self, message, chat_id, bot):
-        self.text = message["text"]
-        self.before = message["before"] if "before" in message else None
-        self.owner = message['owner'] if "owner" in message else None
-        self.date = message['date'] if "before" in message else None
-        self.id = message['id']
+    __slots__ = ("_message", "_text", "_before", "_owner", "_chat", "chat_id", "bot", "invoked_subcommands", "invoked_with")
+
+    def __init__(self, message, chat_id, bot, owner=_UNSET):
+        self._message = message
+        self._text = _UNSET
+        self._before = _UNSET
+        self._owner = owner
+        self._chat = _UNSET
+        self.chat_id = chat_id
         self.bot = bot
-        self.chat = self.bot.get_server(chat_id) or self.bot.get_dm(chat_id)
         self.invoked_subcommands = []
         self.invoked_with = None
 
+    @property
+    def text(self):
+        if self._text is _UNSET:
+            self._text = unescape(self._message["text"])
+        return self._text
+
+    @property
+    def before(self):
+        if self._before is _UNSET:
+            self._before = unescape(self._message.get("before"))
+        return self._before
+
+    @property
+    def owner(self):
+        if self._owner is _UNSET:
+            owner = self._message.get("owner")
+            self._owner = self.bot.get_user(owner) if isinstance(owner, str) else owner
+        return self._owner
+
+    @property
+    def owner_id(self):
+        owner = self._message.get("owner")
+        return owner if owner is None or isinstance(owner, str) else owner.id
+
+    @property
+    def date(self):
+        return self._message.get("date")
+
+    @property
+    def id(self):
+        return self._message["id"]
+
+    @property
+    def chat(self):
+        if self._chat is _UNSET:
+            self._chat = self.bot.get_server(self.chat_id) or self.bot.get_dm(self.chat_id)
+        return self._chat
+
     async def send(self, text, embed=None):
-        return await self.bot.send(text, self.chat.id, embed)
+        return await self.bot.send(text, self.chat_id, embed)
 
     async def edit(self, text, embed=None):
-        await self.bot.edit(text, self.id, self.chat.id, embed)
+        await self.bot.edit(text, self.id, self.chat_id, embed)
 
     async def delete(self):
-        await self.bot.delete(self.id, self.chat.id)
+        await self.bot.delete(self.id, self.chat_id)
 
     def typing(self):
         return TypingIndicator(self)
 
     async def send_typing(self):
-        await self.bot.sio_instances[self.chat.id].emit('typing', namespace='/chat')
+        await self.bot.connections.emit(self.chat_id, 'typing')
 
     async def stop_typing(self):
-        await self.bot.sio_instances[self.chat.id].emit('stop_typing', namespace='/chat')
\ No newline at end of file
+        await self.bot.connections.emit(self.chat_id, 'stop_typing')
@@ -0,0 +1,86 @@
+import inspect
+
+from slchat.models import User
+
+
+TRUE_VALUES = ('yes', 'y', 'true', 't', '1', 'enable', 'on')
+FALSE_VALUES = ('no', 'n', 'false', 'f', '0', 'disable', 'off')
+
+converters = {}
+
+
+class Converter:
+    def convert(self, ctx, argument):
+        raise NotImplementedError
+
+
+class UserConverter(Converter):
+    def convert(self, ctx, argument):
+        user = ctx.bot.get_user(argument.lstrip("@"))
+        if user is None:
+            raise ValueError(f"User '{argument}' not found")
+        return user
+
+
+def register_converter(annotation, converter):
+    if isinstance(converter, type) and issubclass(converter, Converter):
+        converter = converter()
+    if isinstance(converter, Converter):
+        converter = converter.convert
+    converters[annotation] = converter
+
+
+def convert_type(value, annotation, param):
+    if annotation is inspect._empty:
+        return value
+    if isinstance(value, annotation):
+        return value
+    try:
+        if annotation is bool:
+            lowered = value.strip().lower()
+            if lowered in TRUE_VALUES:
+                return True
+            elif lowered in FALSE_VALUES:
+                return False
+            else:
+                raise ValueError()
+        return annotation(value)
+    except Exception:
+        raise ValueError(f"Argument '{param.name}' expected {annotation.__name__}, got '{value}'")
+
+
+def build_converter(annotation, name):
+    if annotation is inspect._empty or annotation is str:
+        return None
+    if annotation in converters:
+        return converters[annotation]
+    if isinstance(annotation, type) and issubclass(annotation, Converter):
+        return annotation().convert
+    if isinstance(annotation, Converter):
+        return annotation.convert
+
+    error = f"Argument '{name}' expected {getattr(annotation, '__name__', annotation)}, got '{{}}'"
+
+    if annotation is bool:
+        def convert(ctx, value):
+            if isinstance(value, bool):
+                return value
+            lowered = value.strip().lower()
+            if lowered in TRUE_VALUES:
+                return True
+            if lowered in FALSE_VALUES:
+                return False
+            raise ValueError(error.format(value))
+        return convert
+
+    def convert(ctx, value):
+        if isinstance(value, annotation):
+            return value
+        try:
+            return annotation(value)
+        except Exception:
+            raise ValueError(error.format(value))
+    return convert
+
+
+register_converter(User, UserConverter)
@@ -0,0 +1,71 @@
+import time
+
+
+BUCKETS = ("user", "chat", "global")
+
+
+class Cooldown:
+    __slots__ = ("rate", "per", "bucket", "_windows")
+
+    def __init__(self, rate, per, bucket="user"):
+        if bucket not in BUCKETS:
+            raise ValueError(f"Unknown cooldown bucket: {bucket}")
+        if rate < 1 or per <= 0:
+            raise ValueError("Cooldown rate must be at least 1 and per must be positive")
+        self.rate = rate
+        self.per = per
+        self.bucket = bucket
+        self._windows = {}
+
+    def key(self, ctx):
+        if self.bucket == "user":
+            return ctx.owner_id
+        if self.bucket == "chat":
+            return ctx.chat_id
+        return None
+
+    def _prune(self, now):
+        windows = self._windows
+        while windows:
+            key = next(iter(windows))
+            if windows[key][0] + self.per > now:
+                return
+            del windows[key]
+
+    def retry_after(self, ctx, now=None):
+        now = time.monotonic() if now is None else now
+        self._prune(now)
+        window = self._windows.get(self.key(ctx))
+        if window is None or window[1] < self.rate:
+            return 0.0
+        return window[0] + self.per - now
+
+    def consume(self, ctx, now=None):
+        now = time.monotonic() if now is None else now
+        self._prune(now)
+        key = self.key(ctx)
+        window = self._windows.get(key)
+        if window is None:
+            self._windows[key] = [now, 1]
+        else:
+            window[1] += 1
+
+    def reset(self, ctx=None):
+        if ctx is None:
+            self._windows.clear()
+        else:
+            self._windows.pop(self.key(ctx), None)
+
+    def __len__(self):
+        return len(self._windows)
+
+    def __repr__(self):
+        return f"Cooldown(rate={self.rate}, per={self.per}, bucket={self.bucket!r})"
+
+
+def as_cooldowns(cooldown):
+    if cooldown is None:
+        return ()
+    if isinstance(cooldown, Cooldown):
+        return (cooldown,)
+    return tuple(cooldown)
@@ -1,56 +1,102 @@
-import requests, socketio, asyncio, aiohttp, uuid, time
-import traceback
-import shlex
+import asyncio
 import inspect
-import html
+import time
+import traceback
 
 from slchat.classes import Context, Group, Command, Embed
-from slchat.models import Struct
+from slchat.classes.context import unescape
+from slchat.classes.cooldown import as_cooldowns
+from slchat.classes.converter import convert_type
+from slchat.bulk import BulkOperation
+from slchat.cache import UserCache, MembershipIndex
+from slchat.connection import ChatConnectionManager, Reconnector, backoff, socket_client
+from slchat.executor import CommandExecutor
+from slchat.http import HTTPClient
+from slchat.messages import MessageCache
+from slchat.metrics import BotMetrics
+from slchat.models import Server, DM, Members
+from slchat.ratelimit import SendScheduler, PendingSends
+from slchat.scheduler import EventScheduler, PRIORITY_TYPING, PRIORITY_EVENT, PRIORITY_COMMAND
+from slchat.store import StateStore, snapshot_chat
+from slchat.tokenizer import next_token, TokenizeError
+from slchat.waiters import WaiterRegistry
+from slchat.watchdog import Watchdog
 
 
 domain = "slchat.alwaysdata.net"
 
 
-def convert_type(value, annotation, param):
-    if annotation is inspect._empty:
-        return value
-    if isinstance(value, annotation):
-        return value
-    try:
-        if annotation is bool:
-            lowered = value.strip().lower()
-            if lowered in ('yes', 'y', 'true', 't', '1', 'enable', 'on'):
-                return True
-            elif lowered in ('no', 'n', 'false', 'f', '0', 'disable', 'off'):
-                return False
-            else:
-                raise ValueError()
-        return annotation(value)
-    except Exception:
-        raise ValueError(f"Argument '{param.name}' expected {annotation.__name__}, got '{value}'")
-
-
 class Bot:
-    def __init__(self, prefix, debug=False):
+    def __init__(self, prefix, debug=False, pool_size=None, join_concurrency=10, join_timeout=30, ready_chats=None,
+                 send_rate=4 / 3, send_burst=1, global_send_rate=None, global_send_burst=1, send_window=8, send_timeout=5,
+                 user_cache_size=None, user_cache_ttl=None, max_concurrency=100, max_queue=10000, ordered_events=True,
+                 overflow="shed", thread_workers=None, process_workers=None, http_limit=100, http_retries=3,
+                 negative_cache_ttl=30, fetch_concurrency=16, metrics=False, metrics_host="127.0.0.1", metrics_port=None,
+                 slow_handler_threshold=None, base_url=None, shard_filter=None, reconnect=True, reconnect_attempts=0,
+                 reconnect_delay=1, reconnect_delay_max=30, reconnect_jitter=0.5, lazy_chats=(), idle_timeout=None,
+                 state_path=None, snapshot_interval=300, message_cache_size=100, message_cache_bytes=4 * 1024 * 1024):
         self.prefix = prefix
         self.debug = debug
+        self.base_url = (base_url or f"https://{domain}").rstrip("/")
+        self.join_concurrency = join_concurrency
+        self.join_timeout = join_timeout
+        self.fetch_concurrency = fetch_concurrency
+        self.ready_chats = set(ready_chats or ())
+        self.shard_filter = shard_filter
+        self.reconnect = reconnect
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_delay_max = reconnect_delay_max
+        self.reconnect_jitter = reconnect_jitter
+        self._rejoins = {}
+        self.lazy_chats = frozenset(lazy_chats)
+        self.idle_timeout = idle_timeout
+        self._hibernator = None
+        self.state_store = StateStore(state_path) if state_path else None
+        self.snapshot_interval = snapshot_interval
+        self._snapshotter = None
+        self.message_cache = MessageCache(message_cache_size, message_cache_bytes) if message_cache_size else None
+        self._user_reconnector = None
+        self.shard_id = None
+        self.forward = None
 
         self.token = ""
         self._servers = {}
         self._dms = {}
 
-        self.sio_instances = {}
+        self.connections = ChatConnectionManager(self, pool_size)
         self.user_socket = None
+        self._closed = None
+        self._closing = None
         self.user = None
-        self.session = None
-        self._users = {}
-        self._pending_temps = {}
+        self.http = HTTPClient(self.base_url, limit=http_limit, retries=http_retries, negative_ttl=negative_cache_ttl)
+        self._users = UserCache(user_cache_size, user_cache_ttl)
+        self._memberships = MembershipIndex()
+        self.pending_sends = PendingSends(send_window, send_timeout)
         self.events = {}
         self.commands = {}
-        self.waiters = {"message": []}
+        self.waiters = WaiterRegistry()
 
-        self.send_lock = asyncio.Lock()
-        self.last_send_time = 0
+        self.executor = CommandExecutor(thread_workers, process_workers)
+        self.scheduler = EventScheduler(max_concurrency, max_queue, ordered_events, overflow, self.run_error)
+        self.send_scheduler = SendScheduler(send_rate, send_burst, global_send_rate, global_send_burst)
+
+        self.metrics = BotMetrics(self) if metrics or metrics_port is not None else None
+        self.metrics_host = metrics_host
+        self.metrics_port = metrics_port
+        self._metrics_runner = None
+        self.slow_handler_threshold = slow_handler_threshold
+        self.watchdog = Watchdog(slow_handler_threshold) if slow_handler_threshold else None
+        self.before_hooks = []
+        self.after_hooks = []
+
+    @property
+    def session(self):
+        return self.http.session
+
+    @property
+    def sio_instances(self):
+        return self.connections.channels
 
     @property
     def servers(self):
@@ -68,35 +114,107 @@ class Bot:
         self.events[func.__name__] = func
         return func
 
-    def group(self, *, name=None, description="", aliases=None, invoke_without_command=False):
+    def group(self, *, name=None, description="", aliases=None, invoke_without_command=False, cooldown=None):
         def decorator(func):
             group_name = name or func.__name__
-            group = Group(group_name, func, description, aliases, None, invoke_without_command)
+            cooldowns = as_cooldowns(cooldown)
+            group = Group(group_name, func, description, aliases, None, invoke_without_command, cooldowns)
             self.commands[group_name] = group
             if aliases:
                 for alias in aliases:
-                    self.commands[alias] = Group(alias, func, description, None, group_name, invoke_without_command)
+                    self.commands[alias] = Group(alias, func, description, None, group_name, invoke_without_command, cooldowns)
             return group
         return decorator
 
-    def command(self, *, name=None, description="", aliases=None):
+    def command(self, *, name=None, description="", aliases=None, execution="loop", cooldown=None):
         def decorator(func):
             command_name = name or func.__name__
-            self.commands[command_name] = Command(command_name, func, description, aliases)
+            cooldowns = as_cooldowns(cooldown)
+            self.commands[command_name] = Command(command_name, func, description, aliases, None, execution, cooldowns)
             if aliases:
                 for alias in aliases:
-                    self.commands[alias] = Command(alias, func, description, None, command_name)
+                    self.commands[alias] = Command(alias, func, description, None, command_name, execution, cooldowns)
             return func
         return decorator
 
+    def before_invoke(self, func):
+        self.before_hooks.append(func)
+        return func
+
+    def after_invoke(self, func):
+        self.after_hooks.append(func)
+        return func
+
+    async def call_event(self, name, *args):
+        return await self.invoke("event", name, self.events[name](*args))
+
+    async def invoke(self, kind, name, coro):
+        metrics = self.metrics
+        if metrics is None and self.slow_handler_threshold is None and not self.before_hooks and not self.after_hooks:
+            return await coro
+        for hook in self.before_hooks:
+            result = hook(kind, name)
+            if inspect.isawaitable(result):
+                await result
+        error = None
+        start = time.perf_counter()
+        try:
+            return await coro
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if metrics:
+                status = "ok" if error is None else "error"
+                if kind == "command":
+                    metrics.commands.inc(name, status)
+                    metrics.command_latency.observe(elapsed, name)
+                else:
+                    metrics.handlers.inc(name, status)
+                    metrics.handler_latency.observe(elapsed, name)
+            if self.slow_handler_threshold and elapsed > self.slow_handler_threshold:
+                print(f"Slow {kind} '{name}' took {elapsed:.3f}s")
+            for hook in self.after_hooks:
+                result = hook(kind, name, elapsed, error)
+                if inspect.isawaitable(result):
+                    await result
+
+    def profile(self):
+        if self.metrics is None:
+            return {}
+        return self.metrics.profile()
+
     async def run_error(self, exception, context):
         if "on_error" in self.events:
-            await self.events["on_error"](exception, context)
+            await self.call_event("on_error", exception, context)
 
-    async def run(self, token: str, bot_id: str):
+    async def start(self, token: str, bot_id: str):
         self.token = token
+        self.http.start(token, bot_id)
+        if self.metrics is not None and self.metrics_port is not None and self._metrics_runner is None:
+            self._metrics_runner = await self.metrics.serve(self.metrics_host, self.metrics_port)
+        if self.watchdog is not None:
+            self.watchdog.start()
+        if self.idle_timeout and self.lazy_chats and self._hibernator is None:
+            self._hibernator = asyncio.ensure_future(self._hibernate_loop())
+        if self.state_store is not None and self._snapshotter is None:
+            await self.load_state()
+            if self.snapshot_interval:
+                self._snapshotter = asyncio.ensure_future(self._snapshot_loop())
+        self._closed = asyncio.Event()
+        self._closing = None
+
+    async def wait_closed(self):
         try:
-            self.user_socket = socketio.AsyncClient(logger=self.debug, engineio_logger=self.debug)
+            await self._closed.wait()
+        finally:
+            await self.close()
+
+    async def run(self, token: str, bot_id: str):
+        await self.start(token, bot_id)
+        try:
+            self.user_socket = socket_client(self)
 
             @self.user_socket.on('setup', namespace='/user')
             async def on_setup(data):
@@ -118,161 +236,387 @@ class Bot:
             async def on_dm_remove(dm_id):
                 await self.on_dm_remove(dm_id)
 
-            await self.user_socket.connect(f"https://{domain}", headers={"Cookie": f"op={bot_id}; token={self.token}"}, namespaces=['/user'], transports=['websocket'])
+            @self.user_socket.on('notification', namespace='/user')
+            async def on_notification(data):
+                await self.on_socket_notification(data)
+
+            @self.user_socket.on('disconnect', namespace='/user')
+            async def on_disconnect(*args):
+                if self._user_reconnector is not None:
+                    self._user_reconnector.disconnected()
+
+            async def connect():
+                await self.user_socket.connect(self.base_url, headers={"Cookie": f"op={bot_id}; token={self.token}"}, namespaces=['/user'], transports=['websocket'])
+
+            await connect()
+            self._user_reconnector = Reconnector(self, self.user_socket, connect)
         except Exception as e:
             print(traceback.format_exc())
             await self.run_error(e, f"run")
+            await self.close()
             raise RuntimeError("Failed to connect user socket") from e
 
-        self.session = aiohttp.ClientSession()
+        await self.wait_closed()
+
+    async def close(self):
+        if self._closing is None:
+            self._closing = asyncio.ensure_future(self._close())
+        await asyncio.shield(self._closing)
+
+    async def _close(self):
+        if self._closed is not None:
+            self._closed.set()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        for chat_id in list(self._rejoins):
+            self.cancel_rejoin(chat_id)
+        if self._hibernator is not None:
+            self._hibernator.cancel()
+            self._hibernator = None
+        if self._snapshotter is not None:
+            self._snapshotter.cancel()
+            self._snapshotter = None
+        if self._closed is not None:
+            await self.save_state()
+        await self.scheduler.close()
+        await self.connections.close()
+        if self._user_reconnector is not None:
+            self._user_reconnector.stop()
+            self._user_reconnector = None
+        if self.user_socket is not None:
+            await self.user_socket.disconnect()
+            self.user_socket = None
+        await self.http.close()
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+            self._metrics_runner = None
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+
+    def snapshot_state(self):
+        return {
+            "users": [user.to_dict() for user in self._users.values()],
+            "servers": [snapshot_chat(server) for server in self._servers.values()],
+            "dms": [snapshot_chat(dm) for dm in self._dms.values()],
+        }
+
+    async def save_state(self):
+        if self.state_store is None:
+            return
+        snapshot = self.snapshot_state()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.state_store.save, snapshot)
+        except Exception as e:
+            print(traceback.format_exc())
+            await self.run_error(e, "save_state")
 
-        await asyncio.Event().wait()
+    async def load_state(self):
+        try:
+            state = await asyncio.get_running_loop().run_in_executor(None, self.state_store.load)
+        except Exception as e:
+            print(traceback.format_exc())
+            await self.run_error(e, "load_state")
+            return
+        for user in state["users"]:
+            self._users.intern(user)
+        for chat_type, known, entries, model in (("server", self._servers, state["servers"], Server), ("dm", self._dms, state["dms"], DM)):
+            for entry in entries:
+                user_ids = entry.pop("users", None)
+                if user_ids is not None:
+                    entry["users"] = Members(user for user in map(self.get_user, user_ids) if user is not None)
+                    if chat_type == "server":
+                        self._memberships.set_members(entry["id"], None, entry["users"])
+                known.setdefault(entry["id"], model(**entry))
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.save_state()
 
     async def on_socket_user_setup(self, data):
-        self.user = Struct(**data["user"])
-        self._users[self.user.id] = self.user
-
-        if "on_connect" in self.events:
-            await self.events["on_connect"]()
-
-        for server in data["servers"]:
-            server["type"] = "server"
-            self._servers[server["id"]] = Struct(**server)
-            await self.connect_to_chat(server["id"], "server")
+        resync = self.user is not None
+        self.user = self._users.intern(data["user"])
+        self._users.pin(self.user.id)
+        self.http.cookies["op"] = self.user.id
 
-        for dm in data["dms"]:
-            dm["type"] = "dm"
-            self._dms[dm["id"]] = Struct(**dm)
-            await self.connect_to_chat(dm["id"], "dm")
+        if resync:
+            await self.resync(data)
+            return
 
+        if "on_connect" in self.events:
+            await self.call_event("on_connect")
+
+        chats, stale = self.apply_chats(data)
+        for chat_id, chat_type in stale:
+            self.drop_chat(chat_id, chat_type)
+        await self.join_chats(chats)
+
+    def apply_chats(self, data):
+        chats = []
+        stale = []
+        for chat_type, known, entries, model in (("server", self._servers, data["servers"], Server), ("dm", self._dms, data["dms"], DM)):
+            seen = set()
+            for entry in entries:
+                chat_id = entry["id"]
+                entry["type"] = chat_type
+                seen.add(chat_id)
+                chat = known.get(chat_id)
+                if chat is None:
+                    known[chat_id] = model(**entry)
+                else:
+                    chat.update(entry)
+                if self.joins_eagerly(chat_id, chat_type) and chat_id not in self.connections:
+                    chats.append((chat_id, chat_type))
+            stale.extend((chat_id, chat_type) for chat_id in known if chat_id not in seen)
+        return chats, stale
+
+    def drop_chat(self, chat_id: str, chat_type: str):
+        chat = (self._servers if chat_type == "server" else self._dms).pop(chat_id, None)
+        if self.message_cache is not None:
+            self.message_cache.forget(chat_id)
+        if chat_type == "server" and chat is not None and "users" in chat:
+            self._memberships.drop_server(chat_id, chat.users)
+
+    async def on_socket_notification(self, data):
+        chat_id = data.get("chat") if isinstance(data, dict) else data
+        if chat_id is None or not self.owns(chat_id):
+            return
+        chat_type = self.chat_type(chat_id)
+        if chat_type is not None and not self.connections.is_ready(chat_id) and isinstance(data, dict) and "message" in data:
+            await self.on_socket_chat_event("message_receive", {"message": data["message"]}, chat_id, chat_type)
+        if not await self.ensure_connected(chat_id):
+            return
+        if "on_notification" in self.events:
+            await self.call_event("on_notification", data)
+
+    async def resync(self, data):
+        if self.metrics:
+            self.metrics.reconnects.inc("user")
+        chats, stale = self.apply_chats(data)
+        for chat_id, chat_type in stale:
+            if chat_type == "server":
+                await self.on_server_remove(chat_id)
+            else:
+                await self.on_dm_remove(chat_id)
+
+        if "on_reconnect" in self.events:
+            await self.call_event("on_reconnect")
+        await self.join_chats(chats, fire_ready=False)
+
+    async def join_chats(self, chats, fire_ready=True):
+        semaphore = asyncio.Semaphore(self.join_concurrency)
+        total = len(chats)
+        joined = 0
+        priority = self.ready_chats.intersection(chat_id for chat_id, _ in chats)
+        failed = []
+        ready = not fire_ready
+
+        async def join(chat_id, chat_type):
+            nonlocal joined, ready
+            async with semaphore:
+                connected = await self.connect_to_chat(chat_id, chat_type, timeout=self.join_timeout)
+            joined += 1
+            if not connected:
+                failed.append(chat_id)
+            if "on_join_progress" in self.events:
+                await self.call_event("on_join_progress", joined, total)
+            if chat_id in priority:
+                priority.discard(chat_id)
+                if not priority and not ready and not self.ready_chats.intersection(failed):
+                    ready = True
+                    await self.fire_ready()
+
+        await asyncio.gather(*(join(chat_id, chat_type) for chat_id, chat_type in chats))
+        if failed and "on_join_failed" in self.events:
+            await self.call_event("on_join_failed", failed)
+        if not ready:
+            await self.fire_ready()
+
+    async def fire_ready(self):
         if "on_ready" in self.events:
-            await self.events["on_ready"]()
+            await self.call_event("on_ready")
 
-    async def connect_to_chat(self, chat_id: str, chat_type: str):
+    async def connect_to_chat(self, chat_id: str, chat_type: str, timeout=None):
+        metrics = self.metrics
+        start = time.perf_counter() if metrics else 0
         try:
-            sio = socketio.AsyncClient(logger=self.debug, engineio_logger=self.debug)
-
-            @sio.on('setup', namespace='/chat')
-            async def on_socket_chat_setup(data):
-                await self.on_socket_chat_setup(data, chat_type)
-
-            @sio.on('message_receive', namespace='/chat')
-            async def on_socket_message_receive(data):
-                await self.on_socket_message_receive(data, chat_id)
-
-            @sio.on('message_change', namespace='/chat')
-            async def on_socket_message_change(data):
-                await self.on_socket_message_change(data, chat_id)
-
-            @sio.on('chat_change', namespace='/chat')
-            async def on_socket_chat_change(data):
-                await self.on_socket_chat_change(data, chat_id, chat_type)
-
-            @sio.on('user_typing', namespace='/chat')
-            async def on_user_typing(data):
-                await self.on_user_typing(data, chat_id, chat_type)
-
-            if chat_type == "server":
-                @sio.on('user_add', namespace='/chat')
-                async def on_user_add(data):
-                    await self.on_user_add(data, chat_id)
-
-                @sio.on('user_remove', namespace='/chat')
-                async def on_user_remove(user_id):
-                    await self.on_user_remove(user_id, chat_id)
-
-            await sio.connect(f"https://{domain}/chat?type={chat_type}&id={chat_id}&status=online", headers={"Cookie": f"op={self.user.id}; token={self.token}"}, namespaces=['/chat'], transports=['websocket'])
-            self.sio_instances[chat_id] = sio
+            await asyncio.wait_for(self.connections.connect(chat_id, chat_type), timeout)
+            if metrics:
+                metrics.joins.inc("ok")
+                metrics.join_latency.observe(time.perf_counter() - start)
+            return True
         except Exception as e:
+            if metrics:
+                metrics.joins.inc("timeout" if isinstance(e, asyncio.TimeoutError) else "error")
             print(traceback.format_exc())
             await self.run_error(e, f"connect_to_chat - {chat_id}")
             #raise RuntimeError(f"Failed to connect to chat {chat_id}") from e
+            if self.reconnect:
+                self.schedule_rejoin(chat_id, chat_type)
+            return False
+
+    def schedule_rejoin(self, chat_id: str, chat_type: str):
+        if chat_id in self._rejoins or (self._closed is not None and self._closed.is_set()):
+            return
+        self._rejoins[chat_id] = asyncio.ensure_future(self._rejoin(chat_id, chat_type))
+
+    def cancel_rejoin(self, chat_id: str):
+        task = self._rejoins.pop(chat_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def _rejoin(self, chat_id: str, chat_type: str):
+        chats = self._servers if chat_type == "server" else self._dms
+        attempt = 0
+        try:
+            while not self.reconnect_attempts or attempt < self.reconnect_attempts:
+                await asyncio.sleep(backoff(attempt, self.reconnect_delay, self.reconnect_delay_max, self.reconnect_jitter))
+                attempt += 1
+                if chat_id not in chats or chat_id in self.connections:
+                    return
+                try:
+                    await asyncio.wait_for(self.connections.connect(chat_id, chat_type), self.join_timeout)
+                except Exception as e:
+                    print(f"Reconnect to chat {chat_id} failed (attempt {attempt}): {e!r}")
+                    continue
+                if self.metrics:
+                    self.metrics.reconnects.inc("chat")
+                return
+        finally:
+            if self._rejoins.get(chat_id) is asyncio.current_task():
+                del self._rejoins[chat_id]
+
+    async def on_socket_chat_event(self, event, data, chat_id: str, chat_type: str):
+        if self.metrics:
+            self.metrics.events.inc(event, chat_id)
+        if event == "message_receive":
+            await self.on_socket_message_receive(data, chat_id)
+        elif event == "message_change":
+            if self.message_cache is not None:
+                self.cache_message_change(data, chat_id)
+            event = "message_edit" if data["text"] else "message_delete"
+            if event in self.waiters:
+                self.dispatch_message(event, data, chat_id)
+            await self.scheduler.submit(chat_id, PRIORITY_EVENT, self.on_socket_message_change, data, chat_id)
+        elif event == "user_typing":
+            await self.scheduler.submit(chat_id, PRIORITY_TYPING, self.on_user_typing, data, chat_id, chat_type)
+        elif event == "setup":
+            await self.on_socket_chat_setup(data, chat_type)
+        elif event == "chat_change":
+            await self.on_socket_chat_change(data, chat_id, chat_type)
+        elif chat_type == "server":
+            if event == "user_add":
+                await self.scheduler.submit(chat_id, PRIORITY_EVENT, self.on_user_add, data, chat_id)
+            elif event == "user_remove":
+                await self.scheduler.submit(chat_id, PRIORITY_EVENT, self.on_user_remove, data, chat_id)
+
+    def _server_members(self, server_id, users):
+        members = Members(self._users.intern(user) for user in users)
+        before = self._servers.get(server_id)
+        self._memberships.set_members(server_id, before.users if before is not None and "users" in before else None, members)
+        return members
 
     async def on_socket_chat_setup(self, data, chat_type: str):
-        data["chat"]["users"] = []
-        for user in data["users"]:
-            member = Struct(**user)
-            data["chat"]["users"].append(member)
-            self._users[member.id] = member
-        data["chat"]["type"] = chat_type
-        chat_data = Struct(**data["chat"])
+        chat_id = data["chat"]["id"]
         if chat_type == "server":
-            self._servers[chat_data.id] = chat_data
+            data["chat"]["users"] = self._server_members(chat_id, data["users"])
+        else:
+            data["chat"]["users"] = Members(self._users.intern(user) for user in data["users"])
+        data["chat"]["type"] = chat_type
+        chats = self._servers if chat_type == "server" else self._dms
+        before = chats.get(chat_id)
+        if before is None:
+            chats[chat_id] = (Server if chat_type == "server" else DM)(**data["chat"])
         else:
-            self._dms[chat_data.id] = chat_data
+            before.update(data["chat"])
 
     async def on_socket_chat_change(self, data, chat_id: str, chat_type: str):
-        if chat_type == "server":
-            before = self._servers[chat_id]
-            self._servers[chat_id] = data
-            if "on_server_update" in self.events:
-                await self.events["on_server_update"](before, data)
-        else:
-            self._dms[chat_id] = data
+        chats = self._servers if chat_type == "server" else self._dms
+        before = chats.get(chat_id)
+        data["type"] = chat_type
+        chat = (Server if chat_type == "server" else DM)(**data)
+        if before is not None and "users" not in chat and "users" in before:
+            chat.users = before.users
+        chats[chat_id] = chat
+        if chat_type == "server" and "on_server_update" in self.events:
+            await self.call_event("on_server_update", before, chat)
 
     async def on_user_add(self, user, server_id: str):
-        member = Struct(**user)
+        member = self._users.intern(user)
         server = self.get_server(server_id)
+        if member.id in server.users:
+            return
         server.users.append(member)
-        self._users[member.id] = member
+        self._memberships.add(server_id, member.id)
+        self.dispatch("user_join", member, server, chat_id=server_id, owner_id=member.id)
         if "on_user_join" in self.events:
-            await self.events["on_user_join"](member, server)
+            await self.call_event("on_user_join", member, server)
 
     async def on_user_remove(self, user_id: str, server_id: str):
         server = self.get_server(server_id)
-        for user in server.users:
-            if user.id == user_id:
-                server.users.remove(user)
-                break
-        if user_id in self._users:
-            member = self._users[user_id]
-            del self._users[user_id]
+        member = server.users.discard(user_id)
+        self._memberships.remove(server_id, user_id)
+        if not self._memberships.servers_of(user_id):
+            member = self._users.release(user_id) or member
+        if member is not None:
+            self.dispatch("user_remove", member, server, chat_id=server_id, owner_id=user_id)
             if "on_user_remove" in self.events:
-                await self.events["on_user_remove"](member, server)
+                await self.call_event("on_user_remove", member, server)
 
     async def on_dm_add(self, data):
         dm_id = data["id"]
         data["type"] = "dm"
-        dm = Struct(**data)
+        dm = DM(**data)
         self._dms[dm_id] = dm
         self.user.dms.append(dm_id)
-        await self.connect_to_chat(dm_id, "dm")
-        if "on_dm_join" in self.events:
-            await self.events["on_dm_join"](dm)
+        if self.joins_eagerly(dm_id, "dm"):
+            await self.connect_to_chat(dm_id, "dm", timeout=self.join_timeout)
+        if "on_dm_join" in self.events and self.owns(dm_id):
+            await self.call_event("on_dm_join", dm)
 
     async def on_dm_remove(self, dm_id: str):
         if dm_id in self.user.dms:
             self.user.dms.remove(dm_id)
-        if dm_id in self.sio_instances:
-            sio = self.sio_instances.pop(dm_id)
-            await sio.disconnect()
+        self.cancel_rejoin(dm_id)
+        await self.connections.disconnect(dm_id)
+        self.send_scheduler.forget(dm_id)
+        self.pending_sends.forget(dm_id)
+        if self.message_cache is not None:
+            self.message_cache.forget(dm_id)
         if dm_id in self._dms:
             data = self._dms[dm_id]
             del self._dms[dm_id]
-            if "on_dm_remove" in self.events:
-                await self.events["on_dm_remove"](data)
+            if "on_dm_remove" in self.events and self.owns(dm_id):
+                await self.call_event("on_dm_remove", data)
 
     async def on_server_add(self, data):
         server_id = data["id"]
         data["type"] = "server"
-        server = Struct(**data)
+        if "users" in data:
+            data["users"] = self._server_members(server_id, data["users"])
+        server = Server(**data)
         self._servers[server_id] = server
         self.user.servers.append(server_id)
-        await self.connect_to_chat(server_id, "server")
-        if "on_server_join" in self.events:
-            await self.events["on_server_join"](server)
+        if self.joins_eagerly(server_id, "server"):
+            await self.connect_to_chat(server_id, "server", timeout=self.join_timeout)
+        if "on_server_join" in self.events and self.owns(server_id):
+            await self.call_event("on_server_join", server)
 
     async def on_server_remove(self, server_id: str):
         if server_id in self.user.servers:
             self.user.servers.remove(server_id)
-        if server_id in self.sio_instances:
-            sio = self.sio_instances.pop(server_id)
-            await sio.disconnect()
+        self.cancel_rejoin(server_id)
+        await self.connections.disconnect(server_id)
+        self.send_scheduler.forget(server_id)
+        self.pending_sends.forget(server_id)
+        if self.message_cache is not None:
+            self.message_cache.forget(server_id)
         if server_id in self._servers:
             data = self._servers[server_id]
             del self._servers[server_id]
-            if "on_server_remove" in self.events:
-                await self.events["on_server_remove"](data)
+            if "users" in data:
+                self._memberships.drop_server(server_id, data.users)
+            if "on_server_remove" in self.events and self.owns(server_id):
+                await self.call_event("on_server_remove", data)
 
     async def on_user_typing(self, user_id, chat_id: str, chat_type: str):
         user = self.get_user(user_id)
@@ -282,44 +626,75 @@ class Bot:
         else:
             chat = self.get_dm(chat_id)
 
+        self.dispatch("typing", chat, user, chat_id=chat_id, owner_id=user_id)
         if "on_typing" in self.events:
-            await self.events["on_typing"](chat, user)
+            await self.call_event("on_typing", chat, user)
 
     async def on_socket_message_receive(self, data, chat_id: str):
         temp = data.get("temp")
-        if temp and temp in self._pending_temps:
-            future = self._pending_temps.pop(temp)
-            if not future.done():
-                future.set_result(data)
-        await self.message_receive(data['message'], chat_id)
-
-    async def message_receive(self, message, chat_id: str):
-        message['owner'] = self.get_user(message['owner'])
-        message['text'] = html.unescape(message['text'])
-        if "bot" in message['owner'].badges:
+        if temp:
+            self.pending_sends.resolve(temp, data)
+        message = data['message']
+        if self.message_cache is not None:
+            if self.message_cache.get(chat_id, message["id"]) is not None:
+                return
+            self.message_cache.add(chat_id, message)
+        if "message" in self.waiters:
+            self.dispatch_message("message", message, chat_id)
+        owner = self.get_user(message['owner'])
+        if self.is_bot(owner):
             return
-        context = Context(message, chat_id, self)
-        self.dispatch("message", context)
+        is_command = self.is_command(message['text'])
+        if not is_command and "on_message" not in self.events:
+            return
+        priority = PRIORITY_COMMAND if is_command else PRIORITY_EVENT
+        await self.scheduler.submit(chat_id, priority, self.message_receive, message, chat_id, owner, is_command)
+
+    def cache_message_change(self, data, chat_id: str):
+        if data["text"]:
+            before = self.message_cache.edit(chat_id, data["id"], data["text"])
+            if before is not None and "before" not in data:
+                data["before"] = before
+        else:
+            entry = self.message_cache.remove(chat_id, data["id"])
+            if entry is not None and "before" not in data:
+                data["before"] = entry.text
+
+    def dispatch_message(self, event, message, chat_id: str):
+        owner_id = message.get('owner')
+        owner = self.get_user(owner_id) if owner_id is not None else None
+        if not self.is_bot(owner):
+            self.dispatch(event, Context(message, chat_id, self, owner), chat_id=chat_id, owner_id=owner_id)
+
+    def is_bot(self, user):
+        return user is not None and "bot" in getattr(user, "badges", ())
+
+    def is_command(self, text):
+        return unescape(text).startswith(self.prefix)
+
+    async def message_receive(self, message, chat_id: str, owner, is_command):
+        context = Context(message, chat_id, self, owner)
         if "on_message" in self.events:
-            await self.events["on_message"](context)
-        if message['text'].startswith(self.prefix):
+            await self.call_event("on_message", context)
+        if is_command:
             await self.process_command(context, message)
 
     async def process_command(self, ctx: Context, message):
-        raw = message['text'][len(self.prefix):]
+        raw = ctx.text[len(self.prefix):]
 
         try:
-            parts = shlex.split(raw)
-        except:
+            command_name, pos = next_token(raw)
+        except TokenizeError:
             await self.run_error("Invalid quotes in command", "process_command")
             return
 
-        if not parts:
+        if command_name is None:
             return
 
-        command_name = parts.pop(0)
         command_info = self.commands.get(command_name)
         if not command_info:
+            if self.metrics:
+                self.metrics.commands.inc("", "unknown")
             await self.run_error(f"Unknown command: {command_name}", "process_command")
             return
 
@@ -327,8 +702,13 @@ class Bot:
         invoked_subcommands = []
 
         while isinstance(parent_command, Group):
-            if parts and parts[0] in parent_command.subcommands:
-                subcommand_name = parts.pop(0)
+            try:
+                subcommand_name, end = next_token(raw, pos)
+            except TokenizeError:
+                await self.run_error("Invalid quotes in command", "process_command")
+                return
+            if subcommand_name is not None and subcommand_name in parent_command.subcommands:
+                pos = end
                 invoked_subcommands.append(subcommand_name)
                 parent_command = parent_command.subcommands[subcommand_name]
             else:
@@ -345,170 +725,260 @@ class Bot:
         else:
             command_func = parent_command.func
 
-        command_signature = inspect.signature(command_func)
-        params = list(command_signature.parameters.values())[1:]
-
-        required = sum(1 for p in params if p.default is inspect._empty and p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
-
-        if len(parts) < required:
-            await self.run_error(f"Missing arguments for command: {command_name}", "process_command")
-            return
+        if parent_command.cooldowns:
+            cooldown, retry_after = parent_command.check_cooldowns(ctx)
+            if cooldown is not None:
+                if self.metrics:
+                    self.metrics.cooldowns.inc(parent_command.name, cooldown.bucket)
+                if "on_command_cooldown" in self.events:
+                    await self.call_event("on_command_cooldown", ctx, cooldown, retry_after)
+                return
 
-        final_args = []
-        final_kwargs = {}
-        idx = 0
-        remaining_text = " ".join(parts)
+        try:
+            args, kwargs = parent_command.signature.bind(ctx, raw[pos:], command_name)
+        except TokenizeError:
+            return await self.run_error("Invalid quotes in command", "process_command")
+        except ValueError as e:
+            if self.metrics:
+                self.metrics.commands.inc(parent_command.name, "invalid")
+            return await self.run_error(str(e), "process_command")
 
-        for p in params:
-            if p.kind == p.VAR_POSITIONAL:
-                final_args.extend(convert_type(raw_arg, p.annotation, p) for raw_arg in parts[idx:])
-                break
-            elif p.kind == p.POSITIONAL_ONLY or p.kind == p.POSITIONAL_OR_KEYWORD:
-                if idx < len(parts):
-                    raw_arg = parts[idx]
-                    idx += 1
-                else:
-                    raw_arg = p.default
-                final_args.append(convert_type(raw_arg, p.annotation, p))
-            elif p.kind == p.KEYWORD_ONLY:
-                match = next((part for part in parts[idx:] if part.startswith(f"{p.name}=")), None)
-                if match:
-                    raw_value = match.split("=", 1)[1]
-                    final_kwargs[p.name] = convert_type(raw_value, p.annotation, p)
-                    parts.remove(match)
-                else:
-                    if remaining_text:
-                        final_kwargs[p.name] = convert_type(remaining_text, p.annotation, p)
-                        remaining_text = ""
-                    elif p.default is not inspect._empty:
-                        final_kwargs[p.name] = p.default
-                    else:
-                        return await self.run_error(f"Missing required keyword-only argument for command: {p.name}", "process_command")
         try:
-            await command_func(ctx, *final_args, **final_kwargs)
+            if parent_command.execution == "loop":
+                await self.invoke("command", parent_command.name, command_func(ctx, *args, **kwargs))
+            else:
+                await self.invoke("command", parent_command.name, self.executor.run(parent_command.execution, command_func, ctx, args, kwargs))
         except Exception as e:
             await self.run_error(e, f"Command: {command_name}")
 
     async def on_socket_message_change(self, data, chat_id: str):
-        if "on_message_edit" in self.events or "on_message_delete" in self.events:
-            if 'owner' in data:
-                data['owner'] = self.get_user(data['owner'])
-                if "bot" in data['owner'].badges:
-                    return
-
-            if data["text"]:
-                data['text'] = html.unescape(data['text'])
-                if data["before"]:
-                    data['before'] = html.unescape(data['before'])
-                if "on_message_edit" in self.events:
-                    context = Context(data, chat_id, self)
-                    await self.events["on_message_edit"](context)
-            elif "on_message_delete" in self.events:
-                if data["before"]:
-                    data['before'] = html.unescape(data['before'])
-                context = Context(data, chat_id, self)
-                await self.events["on_message_delete"](context)
-
-    async def send(self, text, chat_id: str, embed: Embed = None):
-        text = str(text)
-        async with self.send_lock:
-            now = time.monotonic()
-            elapsed = now - self.last_send_time
-            delay = max(0.0, 0.75 - elapsed)
-            if delay > 0:
-                await asyncio.sleep(delay)
-            self.last_send_time = time.monotonic()
-            if chat_id not in self.sio_instances:
-                await self.run_error(f"Invalid chat: {chat_id}", "send")
-                return
-            try:
-                temp_id = str(uuid.uuid4())
-                future = asyncio.get_running_loop().create_future()
-                self._pending_temps[temp_id] = future
-
-                parts = []
-                if text:
-                    parts.append(text)
-                if embed:
-                    parts.append(embed.build())
-                text = "\n".join(parts)
-
-                await self.sio_instances[chat_id].emit('message_send', {"text": text, "temp": temp_id}, namespace='/chat')
-                try:
-                    message_data = await asyncio.wait_for(future, timeout=5)
-                    message = message_data["message"]
-                    return Context(message, chat_id, self)
-                except asyncio.TimeoutError:
-                    print("Timeout waiting for message confirmation")
-                    return None
-            except Exception as e:
-                await self.run_error(e, "send")
+        handler = "on_message_edit" if data["text"] else "on_message_delete"
+        if handler not in self.events:
+            return
 
-    async def edit(self, text, message_id: str, chat_id: str, embed: Embed = None):
-        if chat_id not in self.sio_instances:
-            await self.run_error(f"Invalid chat: {chat_id}", "edit")
+        owner_id = data.get('owner')
+        owner = self.get_user(owner_id) if owner_id is not None else None
+        if self.is_bot(owner):
             return
+
+        await self.call_event(handler, Context(data, chat_id, self, owner))
+
+    async def send(self, text, chat_id: str, embed: Embed = None, confirm=True):
+        status, result = await self._send(text, chat_id, embed, confirm)
+        return result if status in ("ok", "unconfirmed") else None
+
+    async def _send(self, text, chat_id: str, embed: Embed = None, confirm=True):
+        text = str(text)
+        if chat_id not in self.connections:
+            if self.forward is not None and not self.owns(chat_id):
+                self.forward("send", chat_id, (text, chat_id, embed, False))
+                return "forwarded", None
+            if not await self.ensure_connected(chat_id):
+                error = f"Invalid chat: {chat_id}"
+                await self.run_error(error, "send")
+                return "error", error
+        parts = []
+        if text:
+            parts.append(text)
+        if embed:
+            parts.append(embed.build())
+        text = "\n".join(parts)
+
+        metrics = self.metrics
         try:
-            parts = []
-            if text:
-                parts.append(str(text))
-            if embed:
-                parts.append(embed.build())
-            text = "\n".join(parts)
-            await self.sio_instances[chat_id].emit('message_edit', {"id": message_id, "action": "edit", "text": text}, namespace='/chat')
+            await self.connections.wait_ready(chat_id)
+        except ConnectionError as e:
+            await self.run_error(e, "send")
+            return "error", e
+        temp_id, future = await self.pending_sends.reserve(chat_id)
+        try:
+            await self.send_scheduler.acquire(chat_id)
+            start = time.perf_counter() if metrics else 0
+            await self.connections.emit(chat_id, 'message_send', {"text": text, "temp": temp_id})
+            self.pending_sends.arm(temp_id)
         except Exception as e:
-            await self.run_error(e, "edit")
+            future.cancel()
+            if metrics:
+                metrics.sends.inc("error")
+            await self.run_error(e, "send")
+            return "error", e
+        except BaseException:
+            future.cancel()
+            raise
+        if not confirm:
+            if metrics:
+                metrics.sends.inc("unconfirmed")
+            return "unconfirmed", temp_id
+        message_data = await future
+        if message_data is None:
+            if metrics:
+                metrics.sends.inc("timeout")
+            print("Timeout waiting for message confirmation")
+            return "timeout", None
+        if metrics:
+            metrics.sends.inc("ok")
+            metrics.send_rtt.observe(time.perf_counter() - start)
+        return "ok", Context(message_data["message"], chat_id, self)
+
+    def send_queue_depth(self, chat_id: str = None):
+        return self.send_scheduler.queue_depth(chat_id)
+
+    async def edit(self, text, message_id: str, chat_id: str, embed: Embed = None):
+        await self._edit(text, message_id, chat_id, embed)
+
+    async def _edit(self, text, message_id: str, chat_id: str, embed: Embed = None, throttle=False):
+        parts = []
+        if text:
+            parts.append(str(text))
+        if embed:
+            parts.append(embed.build())
+        data = {"id": message_id, "action": "edit", "text": "\n".join(parts)}
+        return await self._message_edit("edit", chat_id, data, (text, message_id, chat_id, embed), throttle)
 
     async def delete(self, message_id: str, chat_id: str):
-        if chat_id not in self.sio_instances:
-            await self.run_error(f"Invalid chat: {chat_id}", "delete")
-            return
+        await self._delete(message_id, chat_id)
+
+    async def _delete(self, message_id: str, chat_id: str, throttle=False):
+        data = {"id": message_id, "action": "delete"}
+        return await self._message_edit("delete", chat_id, data, (message_id, chat_id), throttle)
+
+    async def _message_edit(self, method, chat_id: str, data, args, throttle):
+        if chat_id not in self.connections:
+            if self.forward is not None and not self.owns(chat_id):
+                self.forward(method, chat_id, args)
+                return "forwarded", None
+            if not await self.ensure_connected(chat_id):
+                error = f"Invalid chat: {chat_id}"
+                await self.run_error(error, method)
+                return "error", error
         try:
-            await self.sio_instances[chat_id].emit('message_edit', {"id": message_id, "action": "delete"}, namespace='/chat')
+            if throttle:
+                await self.send_scheduler.acquire(chat_id)
+            await self.connections.emit(chat_id, 'message_edit', data)
         except Exception as e:
-            await self.run_error(e, "delete")
+            await self.run_error(e, method)
+            return "error", e
+        return "ok", None
 
-    def dispatch(self, event, ctx):
-        waiters = self.waiters.get(event, [])
-        for check, future in waiters:
-            if future.done():
-                continue
-            try:
-                if check is None or check(ctx):
-                    future.set_result(ctx)
-                    self.waiters[event].remove((check, future))
-            except:
-                continue
+    def broadcast(self, text, chat_ids, embed: Embed = None, confirm=True, concurrency=None):
+        return BulkOperation(chat_ids, lambda chat_id: self._send(text, chat_id, embed, confirm), concurrency)
+
+    def bulk_edit(self, chat_id: str, edits, embed: Embed = None, concurrency=None):
+        edits = dict(edits)
+        return BulkOperation(edits, lambda message_id: self._edit(edits[message_id], message_id, chat_id, embed, True), concurrency)
+
+    def bulk_delete(self, chat_id: str, message_ids, concurrency=None):
+        return BulkOperation(message_ids, lambda message_id: self._delete(message_id, chat_id, True), concurrency)
 
-    async def wait_for(self, event, check=None, timeout=None):
-        if event not in self.waiters:
-            self.waiters[event] = []
+    def dispatch(self, event, *args, chat_id=None, owner_id=None):
+        self.waiters.dispatch(event, args, chat_id, owner_id)
+
+    async def wait_for(self, event, check=None, timeout=None, chat_id=None, owner_id=None):
         future = asyncio.get_running_loop().create_future()
-        self.waiters[event].append((check, future))
-        try:
-            return await asyncio.wait_for(future, timeout)
-        except asyncio.TimeoutError:
-            self.waiters[event].remove((check, future))
-            raise
+        self.waiters.add(event, future, check, chat_id, owner_id)
+        return await asyncio.wait_for(future, timeout)
 
     async def change(self, key: str, value: str):
         try:
-            response = requests.post(
-                f"https://{domain}/api/change",
-                data={"key": key, "value": value},
-                headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                cookies={"token": self.token, "op": self.user.id}
-            )
-            response.raise_for_status()
+            await self.http.request("POST", "/api/change", data={"key": key, "value": value})
             print(f"Changed [{key}] into [{value}]")
         except Exception as e:
             await self.run_error(e, "change")
 
-    def get_user(self, user_id: str):
-        if user_id in self._users:
-            return self._users[user_id]
+    def owns(self, chat_id: str):
+        return self.shard_filter is None or self.shard_filter(chat_id)
+
+    def joins_eagerly(self, chat_id: str, chat_type: str):
+        return chat_type not in self.lazy_chats and self.owns(chat_id)
+
+    def chat_type(self, chat_id: str):
+        if chat_id in self._servers:
+            return "server"
+        if chat_id in self._dms:
+            return "dm"
         return None
 
+    async def ensure_connected(self, chat_id: str):
+        if chat_id in self.connections:
+            return True
+        chat_type = self.chat_type(chat_id)
+        if chat_type is None or not self.owns(chat_id):
+            return False
+        return await self.connect_to_chat(chat_id, chat_type, timeout=self.join_timeout)
+
+    async def hibernate(self, chat_id: str):
+        channel = self.connections.channels.get(chat_id)
+        if channel is None:
+            return
+        self.cancel_rejoin(chat_id)
+        await self.connections.disconnect(chat_id)
+        self.send_scheduler.forget(chat_id)
+        self.pending_sends.forget(chat_id)
+        if self.metrics:
+            self.metrics.hibernations.inc(channel.chat_type)
+
+    async def hibernate_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for chat_id in self.connections.idle(cutoff, self.lazy_chats):
+            if self.pending_sends.in_flight(chat_id) or self.send_scheduler.queue_depth(chat_id) or self.scheduler.queue_depth(chat_id):
+                continue
+            await self.hibernate(chat_id)
+
+    async def _hibernate_loop(self):
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            try:
+                await self.hibernate_idle()
+            except Exception as e:
+                print(traceback.format_exc())
+                await self.run_error(e, "hibernate_idle")
+
+    def get_user(self, user_id: str):
+        return self._users.get(user_id)
+
+    def user_cache_stats(self):
+        return self._users.stats()
+
+    def stats(self):
+        stats = {
+            "servers": len(self._servers),
+            "dms": len(self._dms),
+            "connected_chats": len(self.connections),
+            "users": self.user_cache_stats(),
+            "events": self.scheduler.stats(),
+            "pending_sends": len(self.pending_sends),
+            "send_queue_depth": self.send_queue_depth(),
+            "waiters": len(self.waiters),
+        }
+        if self.message_cache is not None:
+            stats["messages"] = self.message_cache.stats()
+        if self.metrics is not None:
+            stats["metrics"] = self.metrics.snapshot()
+        return stats
+
+    def metrics_text(self):
+        return self.metrics.render() if self.metrics is not None else ""
+
+    def get_message(self, chat_id: str, message_id: str):
+        entry = self.message_cache.get(chat_id, message_id) if self.message_cache is not None else None
+        return Context(entry, chat_id, self) if entry is not None else None
+
+    def history(self, chat_id: str, limit=None):
+        if self.message_cache is None:
+            return
+        for entry in self.message_cache.history(chat_id, limit):
+            yield Context(entry, chat_id, self)
+
+    def is_member(self, user_id: str, server_id: str):
+        return server_id in self._memberships.servers_of(user_id)
+
+    def get_members(self, server_id: str):
+        server = self.get_server(server_id)
+        return server.users if server is not None and "users" in server else Members()
+
+    def mutual_servers(self, user_id: str):
+        return [self._servers[server_id] for server_id in self._memberships.servers_of(user_id) if server_id in self._servers]
+
     def get_server(self, server_id: str):
         if server_id in self._servers:
             return self._servers[server_id]
@@ -521,32 +991,92 @@ class Bot:
 
     async def fetch_user(self, user_id):
         user = self.get_user(user_id)
+        metrics = self.metrics
         if user:
+            if metrics:
+                metrics.fetches.inc("user", "cached")
             return user
-        else:
-            try:
-                async with self.session.get(f"https://{domain}/api/user/{user_id}", cookies={"token": self.token, "op": self.user.id}) as response:
-                    response.raise_for_status()
-                    json = await response.json()
-                    user = Struct(**json)
-                    self._users[user_id] = user
-                    return user
-            except Exception:
-                return None
+        start = time.perf_counter() if metrics else 0
+        try:
+            json = await self.http.get(f"/api/user/{user_id}")
+        except Exception as e:
+            if metrics:
+                metrics.fetches.inc("user", "error")
+            await self.run_error(e, f"fetch_user - {user_id}")
+            return None
+        if metrics:
+            metrics.fetches.inc("user", "ok" if json is not None else "not_found")
+            metrics.fetch_latency.observe(time.perf_counter() - start, "user")
+        if json is None:
+            return None
+        return self._users.intern({"id": user_id, **json})
 
     async def fetch_server(self, server_id):
         server = self.get_server(server_id)
+        metrics = self.metrics
         if server:
+            if metrics:
+                metrics.fetches.inc("server", "cached")
             return server
-        else:
-            try:
-                async with self.session.get(f"https://{domain}/api/server/{server_id}", cookies={"token": self.token, "op": self.user.id}) as response:
-                    response.raise_for_status()
-                    json = await response.json()
-                    json["type"] = "server"
-                    json["id"] = server_id
-                    server = Struct(**json)
-                    self._servers[server_id] = server
-                    return server
-            except Exception:
-                return None
\ No newline at end of file
+        start = time.perf_counter() if metrics else 0
+        try:
+            json = await self.http.get(f"/api/server/{server_id}")
+        except Exception as e:
+            if metrics:
+                metrics.fetches.inc("server", "error")
+            await self.run_error(e, f"fetch_server - {server_id}")
+            return None
+        if metrics:
+            metrics.fetches.inc("server", "ok" if json is not None else "not_found")
+            metrics.fetch_latency.observe(time.perf_counter() - start, "server")
+        if json is None:
+            return None
+        server = self.get_server(server_id)
+        if server is None:
+            data = {**json, "type": "server", "id": server_id}
+            if "users" in data:
+                data["users"] = self._server_members(server_id, data["users"])
+            server = self._servers[server_id] = Server(**data)
+        return server
+
+    async def fetch_users(self, user_ids, concurrency=None):
+        user_ids = list(user_ids)
+        results = {user_id: user async for user_id, user in self.iter_fetch_users(user_ids, concurrency)}
+        return [results.get(user_id) for user_id in user_ids]
+
+    async def fetch_servers(self, server_ids, concurrency=None):
+        server_ids = list(server_ids)
+        results = {server_id: server async for server_id, server in self.iter_fetch_servers(server_ids, concurrency)}
+        return [results.get(server_id) for server_id in server_ids]
+
+    def iter_fetch_users(self, user_ids, concurrency=None):
+        return self._iter_fetch(user_ids, self.get_user, self.fetch_user, concurrency)
+
+    def iter_fetch_servers(self, server_ids, concurrency=None):
+        return self._iter_fetch(server_ids, self.get_server, self.fetch_server, concurrency)
+
+    async def _iter_fetch(self, ids, get, fetch, concurrency):
+        limit = concurrency or self.fetch_concurrency
+
+        async def fetch_one(entity_id):
+            return entity_id, await fetch(entity_id)
+
+        pending = set()
+        try:
+            for entity_id in ids:
+                cached = get(entity_id)
+                if cached is not None:
+                    yield entity_id, cached
+                    continue
+                pending.add(asyncio.ensure_future(fetch_one(entity_id)))
+                if len(pending) >= limit:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
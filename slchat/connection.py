@@ -0,0 +1,265 @@
+import asyncio
+import random
+import time
+import socketio
+
+
+CHAT_EVENTS = ("setup", "message_receive", "message_change", "chat_change", "user_typing", "user_add", "user_remove")
+
+
+def backoff(attempt, delay=1, maximum=30, jitter=0.5):
+    return min(maximum, delay * 2 ** attempt) * (1 + jitter * (2 * random.random() - 1))
+
+
+def socket_client(bot):
+    return socketio.AsyncClient(logger=bot.debug, engineio_logger=bot.debug, reconnection=False)
+
+
+class Reconnector:
+    def __init__(self, bot, sio, connect, give_up=None):
+        self.bot = bot
+        self.sio = sio
+        self.connect = connect
+        self.give_up = give_up
+        self.active = True
+        self.task = None
+
+    def disconnected(self):
+        if not self.active or not self.bot.reconnect or self.task is not None:
+            return
+        self.task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        bot = self.bot
+        attempt = 0
+        try:
+            while self.active and (not bot.reconnect_attempts or attempt < bot.reconnect_attempts):
+                await asyncio.sleep(backoff(attempt, bot.reconnect_delay, bot.reconnect_delay_max, bot.reconnect_jitter))
+                attempt += 1
+                try:
+                    await self.connect()
+                    return
+                except Exception as e:
+                    print(f"Reconnect failed (attempt {attempt}): {e!r}")
+            if self.active and self.give_up is not None:
+                await self.give_up()
+        finally:
+            self.task = None
+
+    def stop(self):
+        self.active = False
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+
+class Transport:
+    def __init__(self, manager, shared=False):
+        self.manager = manager
+        self.shared = shared
+        self.chat_id = None
+        self.chats = set()
+        self.connected = False
+        self.url = None
+        self.sio = socket_client(manager.bot)
+        self.reconnector = Reconnector(manager.bot, self.sio, self._reconnect, self._give_up)
+        for event in CHAT_EVENTS:
+            self.sio.on(event, self._handler(event), namespace='/chat')
+        self.sio.on('connect', self._on_connect, namespace='/chat')
+        self.sio.on('disconnect', self._on_disconnect, namespace='/chat')
+
+    def _handler(self, event):
+        if self.shared:
+            async def handler(data):
+                await self.manager.route(data["chat"], event, data.get("data"))
+        else:
+            async def handler(data=None):
+                await self.manager.route(self.chat_id, event, data)
+        return handler
+
+    async def _on_connect(self):
+        if not self.connected:
+            return
+        for chat_id in list(self.chats):
+            channel = self.manager.channels.get(chat_id)
+            if channel is None:
+                continue
+            if self.shared:
+                await self.sio.emit('join', {"type": channel.chat_type, "id": chat_id, "status": "online"}, namespace='/chat')
+            channel.ready.set()
+        self.manager.reconnected(self)
+
+    async def _on_disconnect(self, *args):
+        for chat_id in self.chats:
+            channel = self.manager.channels.get(chat_id)
+            if channel is not None:
+                channel.ready.clear()
+        if self.connected:
+            self.reconnector.disconnected()
+
+    async def _reconnect(self):
+        await self.sio.connect(self.url, headers=self.manager._headers(), namespaces=['/chat'], transports=['websocket'])
+
+    async def _give_up(self):
+        for chat_id in list(self.chats):
+            await self.manager.disconnect(chat_id)
+
+    async def connect(self, url, headers):
+        self.url = url
+        await self.sio.connect(url, headers=headers, namespaces=['/chat'], transports=['websocket'])
+        self.connected = True
+
+    async def emit(self, chat_id, event, data=None):
+        if self.shared:
+            await self.sio.emit(event, {"chat": chat_id, "data": data}, namespace='/chat')
+        else:
+            await self.sio.emit(event, data, namespace='/chat')
+
+    async def disconnect(self):
+        self.connected = False
+        self.reconnector.stop()
+        await self.sio.disconnect()
+
+
+class ChatChannel:
+    __slots__ = ("manager", "chat_id", "chat_type", "transport", "ready", "closed", "last_active")
+
+    def __init__(self, manager, chat_id, chat_type, transport):
+        self.manager = manager
+        self.chat_id = chat_id
+        self.chat_type = chat_type
+        self.transport = transport
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.last_active = time.monotonic()
+
+    async def wait_ready(self):
+        if not self.ready.is_set():
+            await self.ready.wait()
+        if self.closed:
+            raise ConnectionError(f"Chat {self.chat_id} was disconnected")
+
+    async def emit(self, event, data=None, namespace='/chat'):
+        await self.transport.emit(self.chat_id, event, data)
+
+    async def disconnect(self):
+        await self.manager.disconnect(self.chat_id)
+
+
+class ChatConnectionManager:
+    def __init__(self, bot, pool_size=None):
+        self.bot = bot
+        self.pool_size = pool_size
+        self.channels = {}
+        self.transports = []
+        self._transport_lock = asyncio.Lock()
+        self._closing = set()
+
+    @property
+    def multiplexed(self):
+        return self.pool_size is not None
+
+    def __contains__(self, chat_id):
+        return chat_id in self.channels
+
+    def __len__(self):
+        return len(self.channels)
+
+    def _headers(self):
+        return {"Cookie": f"op={self.bot.user.id}; token={self.bot.token}"}
+
+    async def _acquire_transport(self):
+        async with self._transport_lock:
+            if len(self.transports) < self.pool_size:
+                transport = Transport(self, shared=True)
+                await transport.connect(f"{self.bot.base_url}/chat?status=online&multiplex=1", self._headers())
+                self.transports.append(transport)
+                return transport
+            return min(self.transports, key=lambda t: len(t.chats))
+
+    async def connect(self, chat_id: str, chat_type: str):
+        if chat_id in self.channels:
+            return self.channels[chat_id]
+        if self.multiplexed:
+            transport = await self._acquire_transport()
+        else:
+            transport = Transport(self)
+            transport.chat_id = chat_id
+        channel = ChatChannel(self, chat_id, chat_type, transport)
+        self.channels[chat_id] = channel
+        transport.chats.add(chat_id)
+        try:
+            if self.multiplexed:
+                if not transport.sio.connected:
+                    return channel
+                await transport.sio.emit('join', {"type": chat_type, "id": chat_id, "status": "online"}, namespace='/chat')
+            else:
+                await transport.connect(f"{self.bot.base_url}/chat?type={chat_type}&id={chat_id}&status=online", self._headers())
+        except BaseException:
+            channel.closed = True
+            channel.ready.set()
+            self.channels.pop(chat_id, None)
+            transport.chats.discard(chat_id)
+            if not transport.shared:
+                self._close_transport(transport)
+            raise
+        channel.ready.set()
+        return channel
+
+    async def disconnect(self, chat_id: str):
+        channel = self.channels.pop(chat_id, None)
+        if not channel:
+            return
+        channel.closed = True
+        channel.ready.set()
+        transport = channel.transport
+        transport.chats.discard(chat_id)
+        if not transport.shared:
+            await asyncio.shield(self._close_transport(transport))
+            return
+        if transport.sio.connected:
+            await transport.sio.emit('leave', {"id": chat_id}, namespace='/chat')
+        if not transport.chats:
+            self.transports.remove(transport)
+            await asyncio.shield(self._close_transport(transport))
+
+    def _close_transport(self, transport):
+        task = asyncio.ensure_future(transport.disconnect())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+        return task
+
+    async def wait_ready(self, chat_id: str):
+        await self.channels[chat_id].wait_ready()
+
+    def is_ready(self, chat_id: str):
+        channel = self.channels.get(chat_id)
+        return channel is not None and channel.ready.is_set() and not channel.closed
+
+    def idle(self, cutoff, chat_types):
+        return [chat_id for chat_id, channel in self.channels.items() if channel.chat_type in chat_types and channel.last_active < cutoff]
+
+    async def emit(self, chat_id: str, event, data=None):
+        channel = self.channels[chat_id]
+        channel.last_active = time.monotonic()
+        await channel.wait_ready()
+        await channel.emit(event, data)
+
+    def reconnected(self, transport):
+        metrics = self.bot.metrics
+        if metrics:
+            metrics.reconnects.inc("chat")
+
+    async def route(self, chat_id, event, data):
+        channel = self.channels.get(chat_id)
+        if channel:
+            channel.last_active = time.monotonic()
+            await self.bot.on_socket_chat_event(event, data, chat_id, channel.chat_type)
+
+    async def close(self):
+        for chat_id in list(self.channels):
+            await self.disconnect(chat_id)
+        for transport in self.transports:
+            await transport.disconnect()
+        self.transports.clear()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
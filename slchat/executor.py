@@ -0,0 +1,110 @@
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+
+
+EXECUTION_MODES = ("loop", "thread", "process")
+
+
+def check_execution(func, execution):
+    if execution not in EXECUTION_MODES:
+        raise ValueError(f"Unknown execution mode: {execution}")
+    if execution != "loop" and inspect.iscoroutinefunction(func):
+        raise TypeError(f"Command '{func.__name__}' must be a regular function to run in a {execution} pool")
+
+
+class ThreadContext:
+    def __init__(self, ctx, loop):
+        self._ctx = ctx
+        self._loop = loop
+
+    def __getattr__(self, name):
+        return getattr(self._ctx, name)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def send(self, text, embed=None):
+        return self._call(self._ctx.send(text, embed))
+
+    def edit(self, text, embed=None):
+        return self._call(self._ctx.edit(text, embed))
+
+    def delete(self):
+        return self._call(self._ctx.delete())
+
+    def send_typing(self):
+        return self._call(self._ctx.send_typing())
+
+    def stop_typing(self):
+        return self._call(self._ctx.stop_typing())
+
+
+class ProcessContext:
+    def __init__(self, ctx):
+        self.text = ctx.text
+        self.before = ctx.before
+        self.owner = ctx.owner
+        self.date = ctx.date
+        self.id = ctx.id
+        self.chat_id = ctx.chat_id
+        self.invoked_subcommands = ctx.invoked_subcommands
+        self.invoked_with = ctx.invoked_with
+        self.actions = []
+
+    def send(self, text, embed=None):
+        self.actions.append(("send", text, embed))
+
+    def edit(self, text, embed=None):
+        self.actions.append(("edit", text, embed))
+
+    def delete(self):
+        self.actions.append(("delete",))
+
+    def send_typing(self):
+        self.actions.append(("send_typing",))
+
+    def stop_typing(self):
+        self.actions.append(("stop_typing",))
+
+
+def _run_in_process(func, ctx, args, kwargs):
+    result = func(ctx, *args, **kwargs)
+    return result, ctx.actions
+
+
+class CommandExecutor:
+    def __init__(self, thread_workers=None, process_workers=None):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._threads = None
+        self._processes = None
+
+    def threads(self):
+        if self._threads is None:
+            self._threads = concurrent.futures.ThreadPoolExecutor(self.thread_workers, thread_name_prefix="slchat-command")
+        return self._threads
+
+    def processes(self):
+        if self._processes is None:
+            self._processes = concurrent.futures.ProcessPoolExecutor(self.process_workers)
+        return self._processes
+
+    async def run(self, execution, func, ctx, args, kwargs):
+        loop = asyncio.get_running_loop()
+        if execution == "thread":
+            call = functools.partial(func, ThreadContext(ctx, loop), *args, **kwargs)
+            return await loop.run_in_executor(self.threads(), call)
+        result, actions = await loop.run_in_executor(self.processes(), _run_in_process, func, ProcessContext(ctx), args, kwargs)
+        for action, *params in actions:
+            await getattr(ctx, action)(*params)
+        return result
+
+    def shutdown(self, wait=True):
+        threads, self._threads = self._threads, None
+        processes, self._processes = self._processes, None
+        if threads is not None:
+            threads.shutdown(wait)
+        if processes is not None:
+            processes.shutdown(wait)
@@ -0,0 +1,90 @@
+import asyncio
+import random
+import time
+
+import aiohttp
+
+
+class HTTPClient:
+    def __init__(self, base_url, limit=100, limit_per_host=0, keepalive_timeout=30, retries=3, backoff=0.5, negative_ttl=30):
+        self.base_url = base_url
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.negative_ttl = negative_ttl
+        self.session = None
+        self.cookies = {}
+        self._inflight = {}
+        self._negative = {}
+
+    def start(self, token, user_id):
+        self.cookies = {"token": token, "op": user_id}
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        self._inflight.clear()
+        self._negative.clear()
+
+    def _retry_delay(self, response, attempt):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * 2 ** attempt * (1 + random.random())
+
+    async def request(self, method, path, **kwargs):
+        attempt = 0
+        while True:
+            async with self.session.request(method, f"{self.base_url}{path}", cookies=self.cookies, **kwargs) as response:
+                if (response.status == 429 or response.status >= 500) and attempt < self.retries:
+                    delay = self._retry_delay(response, attempt)
+                else:
+                    response.raise_for_status()
+                    if response.content_type == "application/json":
+                        return await response.json()
+                    return await response.text()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, path):
+        expiry = self._negative.get(path)
+        if expiry is not None:
+            if expiry > time.monotonic():
+                return None
+            del self._negative[path]
+        task = self._inflight.get(path)
+        if task is None:
+            task = asyncio.ensure_future(self._get(path))
+            self._inflight[path] = task
+            task.add_done_callback(lambda t: self._done(path, t))
+        return await asyncio.shield(task)
+
+    def _done(self, path, task):
+        self._inflight.pop(path, None)
+        if not task.cancelled():
+            task.exception()
+
+    async def _get(self, path):
+        try:
+            return await self.request("GET", path)
+        except aiohttp.ClientResponseError as e:
+            if e.status != 404:
+                raise
+            now = time.monotonic()
+            if len(self._negative) > 10000:
+                self._negative = {key: expiry for key, expiry in self._negative.items() if expiry > now}
+            self._negative[path] = now + self.negative_ttl
+            return None
+
+    def forget(self, path):
+        self._negative.pop(path, None)
@@ -0,0 +1,124 @@
+import sys
+from collections import OrderedDict
+
+
+ENTRY_OVERHEAD = 160
+
+
+class CachedMessage:
+    __slots__ = ("id", "chat", "owner", "text", "date", "size")
+
+    def __init__(self, id, chat, owner, text, date):
+        self.id = id
+        self.chat = chat
+        self.owner = owner
+        self.text = text
+        self.date = date
+        self.size = ENTRY_OVERHEAD + sys.getsizeof(text)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self):
+        return {"id": self.id, "owner": self.owner, "text": self.text, "date": self.date}
+
+    def __repr__(self):
+        return f"CachedMessage({self.to_dict()})"
+
+
+class MessageCache:
+    def __init__(self, max_per_chat=100, max_bytes=4 * 1024 * 1024):
+        self.max_per_chat = max_per_chat
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._order = OrderedDict()
+        self._chats = {}
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, key):
+        return key in self._order
+
+    def add(self, chat_id, message):
+        owner = message.get("owner")
+        entry = CachedMessage(message["id"], chat_id, owner if owner is None or isinstance(owner, str) else owner["id"],
+                              message.get("text", ""), message.get("date"))
+        key = (chat_id, entry.id)
+        previous = self._order.pop(key, None)
+        if previous is not None:
+            self.size -= previous.size
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = OrderedDict()
+        chat[entry.id] = entry
+        chat.move_to_end(entry.id)
+        self._order[key] = entry
+        self.size += entry.size
+        if self.max_per_chat and len(chat) > self.max_per_chat:
+            self._evict(chat_id, next(iter(chat)))
+        while self.max_bytes and self.size > self.max_bytes and self._order:
+            oldest_chat, oldest_id = next(iter(self._order))
+            self._evict(oldest_chat, oldest_id)
+        return entry
+
+    def _evict(self, chat_id, message_id):
+        if self.remove(chat_id, message_id) is not None:
+            self.evictions += 1
+
+    def get(self, chat_id, message_id):
+        chat = self._chats.get(chat_id)
+        return chat.get(message_id) if chat is not None else None
+
+    def edit(self, chat_id, message_id, text):
+        entry = self.get(chat_id, message_id)
+        if entry is None:
+            return None
+        before = entry.text
+        size = ENTRY_OVERHEAD + sys.getsizeof(text)
+        self.size += size - entry.size
+        entry.text = text
+        entry.size = size
+        return before
+
+    def remove(self, chat_id, message_id):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            return None
+        entry = chat.pop(message_id, None)
+        if entry is None:
+            return None
+        del self._order[(chat_id, message_id)]
+        self.size -= entry.size
+        if not chat:
+            del self._chats[chat_id]
+        return entry
+
+    def history(self, chat_id, limit=None):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            return
+        for count, message_id in enumerate(reversed(list(chat))):
+            if limit is not None and count >= limit:
+                return
+            entry = chat.get(message_id)
+            if entry is not None:
+                yield entry
+
+    def forget(self, chat_id):
+        chat = self._chats.pop(chat_id, None)
+        if chat is None:
+            return
+        for message_id, entry in chat.items():
+            del self._order[(chat_id, message_id)]
+            self.size -= entry.size
+
+    def stats(self):
+        return {"messages": len(self._order), "chats": len(self._chats), "bytes": self.size, "evictions": self.evictions}
@@ -0,0 +1,237 @@
+import bisect
+import math
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    __slots__ = ("name", "help", "labels", "values")
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, *labels, value=1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def snapshot(self):
+        if not self.labels:
+            return self.values.get((), 0)
+        return {labels if len(labels) > 1 else labels[0]: value for labels, value in self.values.items()}
+
+    def render(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Gauge:
+    __slots__ = ("name", "help", "labels", "values", "source")
+    type = "gauge"
+
+    def __init__(self, name, help, labels=(), source=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.source = source
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+    def inc(self, *labels, value=1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def dec(self, *labels, value=1):
+        self.values[labels] = self.values.get(labels, 0) - value
+
+    def collect(self):
+        if self.source is None:
+            return self.values
+        value = self.source()
+        if isinstance(value, dict):
+            return {(key,) if not isinstance(key, tuple) else key: item for key, item in value.items()}
+        return {(): value}
+
+    def snapshot(self):
+        values = self.collect()
+        if not self.labels:
+            return values.get((), 0)
+        return {labels if len(labels) > 1 else labels[0]: value for labels, value in values.items()}
+
+    def render(self):
+        for labels, value in self.collect().items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    __slots__ = ("name", "help", "labels", "buckets", "series")
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def _summary(self, series):
+        counts, total, count = series
+        return {"count": count, "sum": total, "mean": total / count if count else 0.0,
+                "p50": self._quantile(counts, count, 0.5), "p95": self._quantile(counts, count, 0.95),
+                "p99": self._quantile(counts, count, 0.99)}
+
+    def _quantile(self, counts, count, q):
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else math.inf
+        return math.inf
+
+    def snapshot(self):
+        if not self.labels:
+            series = self.series.get(())
+            return self._summary(series) if series else self._summary([[0], 0.0, 0])
+        return {labels if len(labels) > 1 else labels[0]: self._summary(series) for labels, series in self.series.items()}
+
+    def render(self):
+        for labels, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {count}"
+
+
+class Registry:
+    def __init__(self, namespace="slchat"):
+        self.namespace = namespace
+        self.metrics = {}
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(f"{self.namespace}_{name}", help, labels))
+
+    def gauge(self, name, help, labels=(), source=None):
+        return self._register(Gauge(f"{self.namespace}_{name}", help, labels, source))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(f"{self.namespace}_{name}", help, labels, buckets))
+
+    def snapshot(self):
+        prefix = len(self.namespace) + 1
+        return {name[prefix:]: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host="127.0.0.1", port=9100, path="/metrics"):
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(body=self.render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+        app = web.Application()
+        app.router.add_get(path, handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        return runner
+
+
+class BotMetrics(Registry):
+    def __init__(self, bot, namespace="slchat"):
+        super().__init__(namespace)
+        self.events = self.counter("events_total", "Chat socket events received.", ("event", "chat"))
+        self.handlers = self.counter("handler_calls_total", "Event handler calls.", ("handler", "status"))
+        self.handler_latency = self.histogram("handler_seconds", "Time spent in event handlers.", ("handler",))
+        self.commands = self.counter("commands_total", "Commands processed.", ("command", "status"))
+        self.command_latency = self.histogram("command_seconds", "Time spent running commands.", ("command",))
+        self.cooldowns = self.counter("command_cooldowns_total", "Commands rejected by a cooldown.", ("command", "bucket"))
+        self.sends = self.counter("sends_total", "Messages sent.", ("status",))
+        self.send_rtt = self.histogram("send_confirm_seconds", "Time from send to server confirmation.")
+        self.fetches = self.counter("fetches_total", "REST fetches.", ("kind", "status"))
+        self.fetch_latency = self.histogram("fetch_seconds", "REST fetch latency.", ("kind",))
+        self.joins = self.counter("chat_joins_total", "Chat connection attempts.", ("status",))
+        self.join_latency = self.histogram("chat_join_seconds", "Chat connection latency.")
+        self.reconnects = self.counter("reconnects_total", "Socket reconnections.", ("socket",))
+        self.hibernations = self.counter("hibernations_total", "Idle chats disconnected.", ("type",))
+
+        self.gauge("connected_chats", "Connected chat channels.", source=lambda: len(bot.connections))
+        self.gauge("servers", "Known servers.", source=lambda: len(bot._servers))
+        self.gauge("dms", "Known DMs.", source=lambda: len(bot._dms))
+        self.gauge("cached_users", "Users held by the user cache.", source=lambda: len(bot._users))
+        self.gauge("pending_sends", "Sends awaiting confirmation.", source=lambda: len(bot.pending_sends))
+        self.gauge("send_queue_depth", "Sends waiting on the rate limiter.", source=lambda: bot.send_scheduler.queue_depth())
+        self.gauge("event_queue_depth", "Events waiting in the scheduler.", source=lambda: bot.scheduler.pending)
+        self.gauge("events_dropped", "Events shed by the scheduler.", source=lambda: bot.scheduler.dropped)
+        self.gauge("cached_messages", "Messages held by the message cache.", source=lambda: len(bot.message_cache) if bot.message_cache else 0)
+        self.gauge("waiters", "Pending wait_for futures.", source=lambda: len(bot.waiters))
+        self.gauge("loop_stalls", "Event loop stalls seen by the watchdog.", source=lambda: bot.watchdog.stalls if bot.watchdog else 0)
+
+    def profile(self):
+        profile = {}
+        for kind, calls, latency in (("command", self.commands, self.command_latency), ("event", self.handlers, self.handler_latency)):
+            for (name, status), count in calls.values.items():
+                if not name:
+                    continue
+                entry = profile.get(name)
+                if entry is None:
+                    entry = profile[name] = {"kind": kind, "calls": 0, "errors": 0}
+                entry["calls"] += count
+                if status == "error":
+                    entry["errors"] += count
+            for (name,), series in latency.series.items():
+                if name in profile:
+                    profile[name].update(latency._summary(series))
+        for entry in profile.values():
+            entry["error_rate"] = entry["errors"] / entry["calls"] if entry["calls"] else 0.0
+        return profile
@@ -1,30 +1,238 @@
-class Struct:
+_set = object.__setattr__
+
+
+def _convert(value, model=None):
+    if isinstance(value, dict):
+        return (model or Struct)(**value)
+    if isinstance(value, list):
+        return [_convert(v, model) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_convert(v, model) for v in value)
+    if isinstance(value, set):
+        return {_convert(v, model) for v in value}
+    return value
+
+
+def _needs_conversion(value):
+    if isinstance(value, dict):
+        return True
+    if isinstance(value, (list, tuple)):
+        return bool(value) and isinstance(value[0], (dict, list, tuple))
+    return False
+
+
+class Nested:
+    __slots__ = ("name", "slot", "model", "container")
+
+    def __init__(self, model=None, container=None):
+        self.name = None
+        self.slot = None
+        self.model = model
+        self.container = container
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = self.slot.__get__(obj, owner)
+        pending = obj._pending
+        if pending and self.name in pending:
+            pending.discard(self.name)
+            value = _convert(value, self.model)
+            if self.container is not None:
+                value = self.container(value)
+            self.slot.__set__(obj, value)
+        return value
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+        if _needs_conversion(value) or self.container is not None and isinstance(value, list):
+            if obj._pending is None:
+                _set(obj, "_pending", set())
+            obj._pending.add(self.name)
+        elif obj._pending:
+            obj._pending.discard(self.name)
+
+    def __delete__(self, obj):
+        self.slot.__delete__(obj)
+
+
+class Model:
+    __slots__ = ("_extra", "_pending", "__weakref__")
+    _fields = ()
+    _field_set = frozenset()
+    _plain = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        plain = []
+        nested = []
+        for klass in reversed(cls.__mro__):
+            for name in klass.__dict__.get("__slots__", ()):
+                if not name.startswith("_"):
+                    plain.append(name)
+            for name, attr in klass.__dict__.items():
+                if isinstance(attr, Nested):
+                    attr.slot = getattr(klass, f"_{name}")
+                    nested.append(name)
+        cls._fields = tuple(dict.fromkeys(plain + nested))
+        cls._field_set = frozenset(cls._fields)
+        cls._plain = frozenset(plain)
+
     def __init__(self, **entries):
+        _set(self, "_extra", None)
+        _set(self, "_pending", None)
+        self.update(entries)
+
+    def update(self, entries):
         for key, value in entries.items():
-            self.__dict__[key] = self._convert(value)
+            self.__setattr__(key, value)
+        return self
+
+    def _set_extra(self, key, value):
+        if self._extra is None:
+            _set(self, "_extra", {})
+        self._extra[key] = value
+        if _needs_conversion(value):
+            if self._pending is None:
+                _set(self, "_pending", set())
+            self._pending.add(key)
+        elif self._pending:
+            self._pending.discard(key)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        extra = self._extra
+        if extra is None or name not in extra:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        value = extra[name]
+        pending = self._pending
+        if pending and name in pending:
+            pending.discard(name)
+            value = extra[name] = _convert(value)
+        return value
+
+    def __setattr__(self, name, value):
+        if name in self._plain:
+            _set(self, name, _convert(value) if _needs_conversion(value) else value)
+        elif name in self._field_set:
+            _set(self, name, value)
+        else:
+            self._set_extra(name, value)
+
+    def __delattr__(self, name):
+        if name in self._field_set:
+            object.__delattr__(self, name)
+        elif self._extra and name in self._extra:
+            del self._extra[name]
+        else:
+            raise AttributeError(name)
 
     def __contains__(self, item):
-        return item in self.__dict__
+        if item in self._field_set:
+            return hasattr(self, item)
+        return self._extra is not None and item in self._extra
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
 
     def __repr__(self):
-        return f"Struct({self.__dict__})"
-
-    def _convert(self, value):
-        if isinstance(value, dict):
-            return Struct(**value)
-        if isinstance(value, list):
-            return [self._convert(v) for v in value]
-        if isinstance(value, tuple):
-            return tuple(self._convert(v) for v in value)
-        if isinstance(value, set):
-            return {self._convert(v) for v in value}
-        return value
+        return f"{type(self).__name__}({dict(self.items())})"
 
-    def items(self):
-        return self.__dict__.items()
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
 
     def keys(self):
-        return self.__dict__.keys()
+        keys = [name for name in self._fields if hasattr(self, name)]
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
 
     def values(self):
-        return self.__dict__.values()
\ No newline at end of file
+        return [getattr(self, key) for key in self.keys()]
+
+    def to_dict(self):
+        return {key: _unconvert(value) for key, value in self.items()}
+
+
+def _unconvert(value):
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, (list, Members)):
+        return [_unconvert(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_unconvert(v) for v in value)
+    return value
+
+
+class Members:
+    __slots__ = ("_members",)
+
+    def __init__(self, users=()):
+        self._members = {user.id: user for user in users}
+
+    def __iter__(self):
+        return iter(self._members.values())
+
+    def __len__(self):
+        return len(self._members)
+
+    def __bool__(self):
+        return bool(self._members)
+
+    def __contains__(self, user):
+        return (user.id if isinstance(user, Model) else user) in self._members
+
+    def __getitem__(self, index):
+        return list(self._members.values())[index]
+
+    def __repr__(self):
+        return f"Members({list(self._members.values())})"
+
+    def get(self, user_id, default=None):
+        return self._members.get(user_id, default)
+
+    def ids(self):
+        return self._members.keys()
+
+    def append(self, user):
+        self._members[user.id] = user
+
+    def remove(self, user):
+        user_id = user.id if isinstance(user, Model) else user
+        if user_id not in self._members:
+            raise ValueError(f"{user_id} is not a member")
+        del self._members[user_id]
+
+    def discard(self, user_id):
+        return self._members.pop(user_id, None)
+
+
+class Struct(Model):
+    __slots__ = ()
+
+
+class User(Model):
+    __slots__ = ("id", "name", "avatar", "status", "badges", "servers", "dms")
+
+
+class Server(Model):
+    __slots__ = ("id", "type", "name", "icon", "owner", "_users")
+    users = Nested(User, Members)
+
+
+class DM(Model):
+    __slots__ = ("id", "type", "name", "_users")
+    users = Nested(User, Members)
@@ -0,0 +1,184 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class SendScheduler:
+    def __init__(self, rate=4 / 3, burst=1, global_rate=None, global_burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.global_bucket = TokenBucket(global_rate, global_burst) if global_rate else None
+        self.buckets = {}
+        self.queues = {}
+        self.ready = deque()
+        self._task = None
+
+    def queue_depth(self, chat_id=None):
+        if chat_id is None:
+            return sum(len(queue) for queue in self.queues.values())
+        queue = self.queues.get(chat_id)
+        return len(queue) if queue else 0
+
+    def queue_depths(self):
+        return {chat_id: len(queue) for chat_id, queue in self.queues.items()}
+
+    def throttled(self, chat_id=None):
+        return self.queue_depth(chat_id) > 0
+
+    def forget(self, chat_id):
+        self.buckets.pop(chat_id, None)
+        queue = self.queues.pop(chat_id, None)
+        if queue is None:
+            return
+        if chat_id in self.ready:
+            self.ready.remove(chat_id)
+        for future in queue:
+            if not future.done():
+                future.set_exception(ConnectionError(f"Chat {chat_id} was removed"))
+
+    def _delay(self, bucket, now):
+        delay = bucket.delay(now)
+        if self.global_bucket:
+            delay = max(delay, self.global_bucket.delay(now))
+        return delay
+
+    def _consume(self, bucket):
+        bucket.consume()
+        if self.global_bucket:
+            self.global_bucket.consume()
+
+    async def acquire(self, chat_id):
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.buckets[chat_id] = TokenBucket(self.rate, self.burst)
+        queue = self.queues.get(chat_id)
+        if not queue and (self.global_bucket is None or not self.ready) and self._delay(bucket, time.monotonic()) <= 0:
+            self._consume(bucket)
+            return
+        if queue is None:
+            queue = self.queues[chat_id] = deque()
+        if not queue:
+            self.ready.append(chat_id)
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._pump())
+        await future
+
+    async def _pump(self):
+        while self.ready:
+            now = time.monotonic()
+            wait = None
+            for _ in range(len(self.ready)):
+                if self.global_bucket:
+                    delay = self.global_bucket.delay(now)
+                    if delay > 0:
+                        wait = delay
+                        break
+                chat_id = self.ready.popleft()
+                queue = self.queues.get(chat_id)
+                if queue is None:
+                    continue
+                while queue and queue[0].done():
+                    queue.popleft()
+                if queue:
+                    bucket = self.buckets.get(chat_id)
+                    if bucket is None:
+                        bucket = self.buckets[chat_id] = TokenBucket(self.rate, self.burst)
+                    delay = self._delay(bucket, now)
+                    if delay <= 0:
+                        self._consume(bucket)
+                        queue.popleft().set_result(None)
+                    elif wait is None or delay < wait:
+                        wait = delay
+                if queue:
+                    self.ready.append(chat_id)
+                else:
+                    del self.queues[chat_id]
+            await asyncio.sleep(wait or 0)
+
+
+class SendWindow:
+    __slots__ = ("semaphore", "count")
+
+    def __init__(self, size):
+        self.semaphore = asyncio.Semaphore(size)
+        self.count = 0
+
+
+class PendingSends:
+    def __init__(self, window=8, timeout=5):
+        self.window = window
+        self.timeout = timeout
+        self.futures = {}
+        self.timers = {}
+        self.windows = {}
+
+    def __contains__(self, temp_id):
+        return temp_id in self.futures
+
+    def __len__(self):
+        return len(self.futures)
+
+    def in_flight(self, chat_id):
+        window = self.windows.get(chat_id)
+        return window.count if window is not None else 0
+
+    def forget(self, chat_id):
+        self.windows.pop(chat_id, None)
+
+    async def reserve(self, chat_id):
+        window = self.windows.get(chat_id)
+        if window is None:
+            window = self.windows[chat_id] = SendWindow(self.window)
+        await window.semaphore.acquire()
+        window.count += 1
+        temp_id = str(uuid.uuid4())
+        future = asyncio.get_running_loop().create_future()
+        self.futures[temp_id] = future
+
+        def release(_):
+            handle = self.timers.pop(temp_id, None)
+            if handle is not None:
+                handle.cancel()
+            self.futures.pop(temp_id, None)
+            window.count -= 1
+            window.semaphore.release()
+
+        future.add_done_callback(release)
+        return temp_id, future
+
+    def arm(self, temp_id):
+        future = self.futures.get(temp_id)
+        if future is not None and not future.done():
+            self.timers[temp_id] = asyncio.get_running_loop().call_later(self.timeout, self._expire, future)
+
+    def resolve(self, temp_id, data):
+        future = self.futures.get(temp_id)
+        if future and not future.done():
+            future.set_result(data)
+
+    def _expire(self, future):
+        if not future.done():
+            future.set_result(None)
@@ -0,0 +1,150 @@
+import asyncio
+import traceback
+from collections import deque
+
+
+PRIORITY_TYPING = 0
+PRIORITY_EVENT = 1
+PRIORITY_COMMAND = 2
+
+OVERFLOW_POLICIES = ("shed", "drop", "block")
+
+
+class Job:
+    __slots__ = ("func", "args", "priority", "queued")
+
+    def __init__(self, func, args, priority):
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.queued = True
+
+
+class EventScheduler:
+    def __init__(self, max_concurrency=100, max_queue=10000, ordered=True, overflow="shed", on_error=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.ordered = ordered
+        self.overflow = overflow
+        self.on_error = on_error
+        self.queues = {}
+        self.pending = 0
+        self.dropped = 0
+        self.tasks = set()
+        self._sheddable = [deque(), deque()]
+        self._semaphore = None
+        self._space = None
+
+    def queue_depth(self, chat_id=None):
+        if chat_id is None:
+            return self.pending
+        queue = self.queues.get(chat_id)
+        return sum(1 for job in queue if job.queued) if queue else 0
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "running": len(self.tasks),
+            "dropped": self.dropped,
+            "chats": len(self.queues),
+        }
+
+    async def submit(self, chat_id, priority, func, *args):
+        if self.pending >= self.max_queue and not self._make_room(priority):
+            if self.overflow != "block":
+                self.dropped += 1
+                return False
+            while self.pending >= self.max_queue:
+                if self._space is None:
+                    self._space = asyncio.Event()
+                self._space.clear()
+                await self._space.wait()
+
+        job = Job(func, args, priority)
+        self.pending += 1
+        if priority < PRIORITY_COMMAND:
+            sheddable = self._sheddable[priority]
+            sheddable.append(job)
+            if len(sheddable) > 2 * self.pending + 64:
+                self._sheddable[priority] = deque(j for j in sheddable if j.queued)
+
+        if not self.ordered:
+            self._spawn(self._run_one(job))
+            return True
+
+        queue = self.queues.get(chat_id)
+        if queue is None:
+            self.queues[chat_id] = deque((job,))
+            self._spawn(self._drain(chat_id))
+        else:
+            queue.append(job)
+        return True
+
+    def _make_room(self, priority):
+        if self.overflow == "shed":
+            for level in (PRIORITY_TYPING, PRIORITY_EVENT):
+                if level > priority:
+                    break
+                sheddable = self._sheddable[level]
+                while sheddable:
+                    job = sheddable.popleft()
+                    if job.queued:
+                        job.queued = False
+                        self.pending -= 1
+                        self.dropped += 1
+                        return True
+        return priority >= PRIORITY_COMMAND
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _take(self, job):
+        if not job.queued:
+            return False
+        job.queued = False
+        self.pending -= 1
+        if self._space is not None and self.pending < self.max_queue:
+            self._space.set()
+        return True
+
+    async def _run_one(self, job):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            if self._take(job):
+                await self._execute(job)
+
+    async def _drain(self, chat_id):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        queue = self.queues[chat_id]
+        try:
+            while queue:
+                job = queue.popleft()
+                if not self._take(job):
+                    continue
+                async with self._semaphore:
+                    await self._execute(job)
+        finally:
+            self.queues.pop(chat_id, None)
+
+    async def _execute(self, job):
+        try:
+            await job.func(*job.args)
+        except Exception as e:
+            print(traceback.format_exc())
+            if self.on_error:
+                await self.on_error(e, getattr(job.func, "__name__", "event"))
+
+    async def close(self):
+        tasks = [task for task in self.tasks if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.queues.clear()
+        self.pending = 0
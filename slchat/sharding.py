@@ -0,0 +1,219 @@
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import threading
+import traceback
+
+import socketio
+
+from slchat.connection import Reconnector
+
+
+USER_EVENTS = ("setup", "server_add", "server_remove", "dm_add", "dm_remove", "notification")
+FORWARDED = ("send", "edit", "delete")
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, shards, replicas=100):
+        self.shards = shards
+        self.replicas = replicas
+        points = sorted((_hash(f"{shard}:{replica}"), shard) for shard in range(shards) for replica in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key):
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._shards[index]
+
+    def filter(self, shard):
+        return lambda chat_id: self.shard_for(chat_id) == shard
+
+
+def _read(conn, loop, queue, tag=None):
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            message = None
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (tag, message))
+        except RuntimeError:
+            return
+        if message is None:
+            return
+
+
+def _start_reader(conn, queue, tag=None):
+    thread = threading.Thread(target=_read, args=(conn, asyncio.get_running_loop(), queue, tag), daemon=True)
+    thread.start()
+    return thread
+
+
+def _run_worker(factory, shard, shards, replicas, token, bot_id, conn):
+    bot = factory()
+    bot.shard_id = shard
+    bot.shard_filter = HashRing(shards, replicas).filter(shard)
+    if bot.state_store is not None:
+        bot.state_store.path = f"{bot.state_store.path}.{shard}"
+    asyncio.run(_serve_worker(bot, token, bot_id, conn))
+
+
+async def _serve_worker(bot, token, bot_id, conn):
+    queue = asyncio.Queue()
+    bot.forward = lambda method, chat_id, args: conn.send(("forward", method, chat_id, args))
+    await bot.start(token, bot_id)
+    _start_reader(conn, queue)
+    handlers = {
+        "setup": bot.on_socket_user_setup,
+        "server_add": bot.on_server_add,
+        "server_remove": bot.on_server_remove,
+        "dm_add": bot.on_dm_add,
+        "dm_remove": bot.on_dm_remove,
+        "notification": bot.on_socket_notification,
+    }
+    tasks = set()
+
+    async def handle(func, *args):
+        try:
+            await func(*args)
+        except Exception as e:
+            print(traceback.format_exc())
+            await bot.run_error(e, f"shard {bot.shard_id} - {func.__name__}")
+
+    async def pump():
+        while True:
+            _, message = await queue.get()
+            if message is None or message[0] == "close":
+                return
+            event, *args = message
+            if event == "call":
+                method, args = args
+                func = getattr(bot, method)
+            else:
+                func = handlers[event]
+            task = asyncio.ensure_future(handle(func, *args))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    pump_task = asyncio.ensure_future(pump())
+    closed = asyncio.ensure_future(bot._closed.wait())
+    try:
+        await asyncio.wait((pump_task, closed), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        pump_task.cancel()
+        closed.cancel()
+        await bot.close()
+        conn.close()
+
+
+class ShardCoordinator:
+    def __init__(self, factory, shards, replicas=100, base_url=None, debug=False, start_method="spawn", reconnect=True,
+                 reconnect_attempts=0, reconnect_delay=1, reconnect_delay_max=30, reconnect_jitter=0.5):
+        from slchat.client import domain
+
+        self.factory = factory
+        self.shards = shards
+        self.replicas = replicas
+        self.base_url = (base_url or f"https://{domain}").rstrip("/")
+        self.debug = debug
+        self.reconnect = reconnect
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_delay_max = reconnect_delay_max
+        self.reconnect_jitter = reconnect_jitter
+        self.ring = HashRing(shards, replicas)
+        self.context = multiprocessing.get_context(start_method)
+        self.processes = []
+        self.pipes = []
+        self.user_socket = None
+        self._reconnector = None
+        self._queue = None
+
+    def shard_for(self, chat_id):
+        return self.ring.shard_for(chat_id)
+
+    def _send(self, shard, message):
+        try:
+            self.pipes[shard].send(message)
+        except (BrokenPipeError, OSError):
+            print(f"Shard {shard} is not running")
+
+    def broadcast(self, event, data):
+        for shard in range(len(self.pipes)):
+            self._send(shard, (event, data))
+
+    def _spawn(self, token, bot_id):
+        for shard in range(self.shards):
+            parent, child = self.context.Pipe()
+            process = self.context.Process(target=_run_worker, name=f"slchat-shard-{shard}",
+                                           args=(self.factory, shard, self.shards, self.replicas, token, bot_id, child))
+            process.start()
+            child.close()
+            self.processes.append(process)
+            self.pipes.append(parent)
+            _start_reader(parent, self._queue, shard)
+
+    async def _connect(self, token, bot_id):
+        self.user_socket = socketio.AsyncClient(logger=self.debug, engineio_logger=self.debug, reconnection=False)
+        for event in USER_EVENTS:
+            self.user_socket.on(event, self._relay(event), namespace='/user')
+
+        async def connect():
+            await self.user_socket.connect(self.base_url, headers={"Cookie": f"op={bot_id}; token={token}"}, namespaces=['/user'], transports=['websocket'])
+
+        async def on_disconnect(*args):
+            if self._reconnector is not None:
+                self._reconnector.disconnected()
+
+        self.user_socket.on('disconnect', on_disconnect, namespace='/user')
+        await connect()
+        self._reconnector = Reconnector(self, self.user_socket, connect)
+
+    def _relay(self, event):
+        async def handler(data):
+            self.broadcast(event, data)
+        return handler
+
+    async def run(self, token: str, bot_id: str):
+        self._queue = asyncio.Queue()
+        self._spawn(token, bot_id)
+        try:
+            await self._connect(token, bot_id)
+            running = self.shards
+            while running:
+                shard, message = await self._queue.get()
+                if message is None:
+                    running -= 1
+                    print(f"Shard {shard} exited")
+                    continue
+                if message[0] == "forward":
+                    _, method, chat_id, args = message
+                    if method in FORWARDED:
+                        self._send(self.shard_for(chat_id), ("call", method, args))
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._reconnector is not None:
+            self._reconnector.stop()
+            self._reconnector = None
+        if self.user_socket is not None:
+            await self.user_socket.disconnect()
+            self.user_socket = None
+        pipes, processes = self.pipes, self.processes
+        self.pipes, self.processes = [], []
+        for pipe in pipes:
+            try:
+                pipe.send(("close",))
+            except (BrokenPipeError, OSError):
+                pass
+        loop = asyncio.get_running_loop()
+        for process in processes:
+            await loop.run_in_executor(None, process.join)
+        for pipe in pipes:
+            pipe.close()
@@ -0,0 +1,50 @@
+import json
+import sqlite3
+import time
+
+from slchat.models import _unconvert
+
+
+TABLES = ("users", "servers", "dms")
+
+
+def snapshot_chat(chat):
+    data = {key: _unconvert(value) for key, value in chat.items() if key != "users"}
+    if "users" in chat:
+        data["users"] = list(chat.users.ids())
+    return data
+
+
+class StateStore:
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        for table in TABLES:
+            db.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return db
+
+    def save(self, snapshot):
+        db = self._connect()
+        try:
+            with db:
+                for table in TABLES:
+                    db.execute(f"DELETE FROM {table}")
+                    db.executemany(f"INSERT INTO {table} (id, data) VALUES (?, ?)",
+                                   ((entry["id"], json.dumps(entry, separators=(",", ":"))) for entry in snapshot[table]))
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('saved_at', ?)", (str(time.time()),))
+        finally:
+            db.close()
+
+    def load(self):
+        db = self._connect()
+        try:
+            state = {table: [json.loads(data) for data, in db.execute(f"SELECT data FROM {table}")] for table in TABLES}
+            row = db.execute("SELECT value FROM meta WHERE key = 'saved_at'").fetchone()
+            state["saved_at"] = float(row[0]) if row else None
+            return state
+        finally:
+            db.close()
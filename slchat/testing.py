@@ -0,0 +1,268 @@
+import asyncio
+import html
+import itertools
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+import socketio
+from aiohttp import web
+
+
+class LocalServer:
+    def __init__(self, host="127.0.0.1", port=0, token=None, escape=True, shutdown_timeout=1):
+        self.host = host
+        self.port = port
+        self.shutdown_timeout = shutdown_timeout
+        self.token = token
+        self.escape = escape
+        self.users = {}
+        self.servers = {}
+        self.dms = {}
+        self.members = {}
+        self.messages = {}
+        self.changes = []
+        self.sessions = {}
+        self.user_sids = {}
+        self._ids = itertools.count(1)
+        self._runner = None
+
+        self.sio = socketio.AsyncServer(async_mode="aiohttp", cors_allowed_origins="*")
+        self.app = web.Application()
+        self.sio.attach(self.app)
+        self.app.router.add_get("/api/user/{id}", self._api_user)
+        self.app.router.add_get("/api/server/{id}", self._api_server)
+        self.app.router.add_post("/api/change", self._api_change)
+
+        self.sio.on("connect", self._user_connect, namespace="/user")
+        self.sio.on("disconnect", self._user_disconnect, namespace="/user")
+        self.sio.on("connect", self._chat_connect, namespace="/chat")
+        self.sio.on("disconnect", self._chat_disconnect, namespace="/chat")
+        for event in ("join", "leave", "message_send", "message_edit", "typing", "stop_typing"):
+            self.sio.on(event, self._chat_handler(event), namespace="/chat")
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None, shutdown_timeout=self.shutdown_timeout)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = site._server.sockets[0].getsockname()[1]
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def add_user(self, user_id, name=None, bot=False, **fields):
+        user = {"id": user_id, "name": name or user_id, "avatar": "", "status": "offline",
+                "badges": ["bot"] if bot else [], "servers": [], "dms": [], **fields}
+        self.users[user_id] = user
+        return user
+
+    def add_server(self, server_id, name=None, owner=None, members=()):
+        self.servers[server_id] = {"id": server_id, "name": name or server_id, "icon": "", "owner": owner}
+        self.members[server_id] = []
+        for user_id in members:
+            self._join(server_id, user_id, "servers")
+        return self.servers[server_id]
+
+    def add_dm(self, dm_id, members=(), name=None):
+        self.dms[dm_id] = {"id": dm_id, "name": name or dm_id}
+        self.members[dm_id] = []
+        for user_id in members:
+            self._join(dm_id, user_id, "dms")
+        return self.dms[dm_id]
+
+    def _join(self, chat_id, user_id, key):
+        self.members[chat_id].append(user_id)
+        self.users[user_id][key].append(chat_id)
+
+    def _chat_setup(self, chat_id):
+        chat = self.servers.get(chat_id) or self.dms.get(chat_id)
+        return {"chat": dict(chat), "users": [self.users[user_id] for user_id in self.members.get(chat_id, ())]}
+
+    def _user_setup(self, user_id):
+        user = self.users[user_id]
+        return {
+            "user": user,
+            "servers": [dict(self.servers[server_id]) for server_id in user["servers"]],
+            "dms": [dict(self.dms[dm_id]) for dm_id in user["dms"]],
+        }
+
+    def _authenticate(self, environ):
+        cookie = SimpleCookie(environ.get("HTTP_COOKIE", ""))
+        user_id = cookie["op"].value if "op" in cookie else None
+        token = cookie["token"].value if "token" in cookie else None
+        if user_id not in self.users or (self.token is not None and token != self.token):
+            return None
+        return user_id
+
+    async def _user_connect(self, sid, environ, auth=None):
+        user_id = self._authenticate(environ)
+        if user_id is None:
+            return False
+        self.user_sids.setdefault(user_id, set()).add(sid)
+        self.sio.start_background_task(self.sio.emit, "setup", self._user_setup(user_id), to=sid, namespace="/user")
+
+    async def _user_disconnect(self, sid, *args):
+        for sids in self.user_sids.values():
+            sids.discard(sid)
+
+    async def _chat_connect(self, sid, environ, auth=None):
+        user_id = self._authenticate(environ)
+        if user_id is None:
+            return False
+        query = {key: values[0] for key, values in parse_qs(environ.get("QUERY_STRING", "")).items()}
+        multiplexed = query.get("multiplex") == "1"
+        self.sessions[sid] = {"user": user_id, "multiplexed": multiplexed, "chat": None}
+        if not multiplexed:
+            chat_id = query.get("id")
+            if chat_id not in self.members or user_id not in self.members[chat_id]:
+                return False
+            self.sessions[sid]["chat"] = chat_id
+            await self.sio.enter_room(sid, chat_id, namespace="/chat")
+            self.sio.start_background_task(self.sio.emit, "setup", self._chat_setup(chat_id), to=sid, namespace="/chat")
+
+    async def _chat_disconnect(self, sid, *args):
+        self.sessions.pop(sid, None)
+
+    def _chat_handler(self, event):
+        async def handler(sid, data=None):
+            session = self.sessions.get(sid)
+            if session is None:
+                return
+            if event in ("join", "leave"):
+                await getattr(self, f"_on_{event}")(sid, session, data)
+                return
+            if session["multiplexed"]:
+                chat_id, data = data["chat"], data.get("data")
+            else:
+                chat_id = session["chat"]
+            await getattr(self, f"_on_{event}")(session["user"], chat_id, data, sid)
+        return handler
+
+    async def _on_join(self, sid, session, data):
+        chat_id = data["id"]
+        if chat_id not in self.members or session["user"] not in self.members[chat_id]:
+            return
+        await self.sio.enter_room(sid, f"mux:{chat_id}", namespace="/chat")
+        await self.sio.emit("setup", {"chat": chat_id, "data": self._chat_setup(chat_id)}, to=sid, namespace="/chat")
+
+    async def _on_leave(self, sid, session, data):
+        await self.sio.leave_room(sid, f"mux:{data['id']}", namespace="/chat")
+
+    async def emit(self, chat_id, event, data=None, skip_sid=None):
+        await self.sio.emit(event, data, room=chat_id, skip_sid=skip_sid, namespace="/chat")
+        await self.sio.emit(event, {"chat": chat_id, "data": data}, room=f"mux:{chat_id}", skip_sid=skip_sid, namespace="/chat")
+
+    async def emit_user(self, user_id, event, data=None):
+        for sid in list(self.user_sids.get(user_id, ())):
+            await self.sio.emit(event, data, to=sid, namespace="/user")
+
+    async def _on_message_send(self, user_id, chat_id, data, sid=None):
+        await self.send_message(chat_id, user_id, data["text"], data.get("temp"))
+
+    async def _on_message_edit(self, user_id, chat_id, data, sid=None):
+        message = self.messages.get(data["id"])
+        if message is None or message["owner"] != user_id:
+            return
+        if data.get("action") == "delete":
+            await self.delete_message(data["id"])
+        else:
+            await self.edit_message(data["id"], data.get("text", ""))
+
+    async def _on_typing(self, user_id, chat_id, data, sid=None):
+        await self.emit(chat_id, "user_typing", user_id, skip_sid=sid)
+
+    async def _on_stop_typing(self, user_id, chat_id, data, sid=None):
+        pass
+
+    async def send_message(self, chat_id, owner_id, text, temp=None):
+        message = {"id": str(next(self._ids)), "text": html.escape(text) if self.escape else text,
+                   "owner": owner_id, "date": time.time(), "chat": chat_id}
+        self.messages[message["id"]] = message
+        data = {"message": {key: value for key, value in message.items() if key != "chat"}}
+        if temp:
+            data["temp"] = temp
+        await self.emit(chat_id, "message_receive", data)
+        await self.notify(chat_id, data["message"], skip=owner_id)
+        return message
+
+    def present(self, chat_id):
+        users = set()
+        for room in (chat_id, f"mux:{chat_id}"):
+            for sid, _ in self.sio.manager.get_participants("/chat", room):
+                session = self.sessions.get(sid)
+                if session is not None:
+                    users.add(session["user"])
+        return users
+
+    async def notify(self, chat_id, message, skip=None):
+        present = self.present(chat_id)
+        chat_type = "server" if chat_id in self.servers else "dm"
+        for user_id in self.members.get(chat_id, ()):
+            if user_id != skip and user_id not in present and self.user_sids.get(user_id):
+                await self.emit_user(user_id, "notification", {"chat": chat_id, "type": chat_type, "message": message})
+
+    async def edit_message(self, message_id, text):
+        message = self.messages[message_id]
+        before = message["text"]
+        message["text"] = html.escape(text) if self.escape else text
+        await self.emit(message["chat"], "message_change", {"id": message_id, "text": message["text"], "before": before,
+                                                            "owner": message["owner"], "date": message["date"]})
+
+    async def delete_message(self, message_id):
+        message = self.messages.pop(message_id)
+        await self.emit(message["chat"], "message_change", {"id": message_id, "text": "", "before": message["text"],
+                                                            "owner": message["owner"], "date": message["date"]})
+
+    async def add_member(self, server_id, user_id):
+        self._join(server_id, user_id, "servers")
+        await self.emit(server_id, "user_add", self.users[user_id])
+
+    async def remove_member(self, server_id, user_id):
+        self.members[server_id].remove(user_id)
+        self.users[user_id]["servers"].remove(server_id)
+        await self.emit(server_id, "user_remove", user_id)
+
+    async def _api_user(self, request):
+        user = self.users.get(request.match_info["id"])
+        if user is None:
+            raise web.HTTPNotFound()
+        return web.json_response(user)
+
+    async def _api_server(self, request):
+        server = self.servers.get(request.match_info["id"])
+        if server is None:
+            raise web.HTTPNotFound()
+        return web.json_response(server)
+
+    async def _api_change(self, request):
+        user_id = request.cookies.get("op")
+        if user_id not in self.users:
+            raise web.HTTPUnauthorized()
+        data = await request.post()
+        self.changes.append((user_id, data["key"], data["value"]))
+        self.users[user_id][data["key"]] = data["value"]
+        return web.json_response({"success": True})
+
+
+async def wait_until(predicate, timeout=10, interval=0.005):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise asyncio.TimeoutError()
+        await asyncio.sleep(interval)
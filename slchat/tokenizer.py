@@ -0,0 +1,57 @@
+import re
+
+
+WHITESPACE = " \t\r\n"
+
+_SPECIAL = re.compile(r'[\'"\\\x0b\x0c\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]')
+_PIECE = re.compile(r'''([^ \t\r\n'"\\]+)|'([^']*)'|"((?:[^"\\]|\\.)*)"|\\(.)''', re.DOTALL)
+_DOUBLE_ESCAPE = re.compile(r'\\(["\\])')
+_UNCLOSED_DOUBLE = re.compile(r'"(?:[^"\\]|\\.)*', re.DOTALL)
+
+
+class TokenizeError(ValueError):
+    pass
+
+
+def next_token(text, pos=0):
+    length = len(text)
+    while pos < length and text[pos] in WHITESPACE:
+        pos += 1
+    if pos >= length:
+        return None, length
+    pieces = []
+    while pos < length and text[pos] not in WHITESPACE:
+        match = _PIECE.match(text, pos)
+        if match is None:
+            if text[pos] == '"':
+                pos = _UNCLOSED_DOUBLE.match(text, pos).end()
+            raise TokenizeError("No escaped character" if pos < length and text[pos] == "\\" else "No closing quotation")
+        bare, single, double, escaped = match.groups()
+        if bare is not None:
+            pieces.append(bare)
+        elif single is not None:
+            pieces.append(single)
+        elif double is not None:
+            pieces.append(_DOUBLE_ESCAPE.sub(r"\1", double) if "\\" in double else double)
+        else:
+            pieces.append(escaped)
+        pos = match.end()
+    return "".join(pieces), pos
+
+
+def split(text):
+    if not _SPECIAL.search(text):
+        return text.split()
+    tokens = []
+    token, pos = next_token(text)
+    while token is not None:
+        tokens.append(token)
+        token, pos = next_token(text, pos)
+    return tokens
+
+
+def rest(text):
+    try:
+        return " ".join(split(text))
+    except TokenizeError:
+        return " ".join(text.split())
@@ -0,0 +1,62 @@
+class WaiterRegistry:
+    def __init__(self):
+        self._events = {}
+
+    def __len__(self):
+        return sum(len(bucket) for buckets in self._events.values() for bucket in buckets.values())
+
+    def __contains__(self, event):
+        return event in self._events
+
+    def count(self, event):
+        buckets = self._events.get(event)
+        return sum(len(bucket) for bucket in buckets.values()) if buckets else 0
+
+    def add(self, event, future, check=None, chat_id=None, owner_id=None):
+        buckets = self._events.get(event)
+        if buckets is None:
+            buckets = self._events[event] = {}
+        key = (chat_id, owner_id)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {}
+        bucket[future] = check
+        future.add_done_callback(lambda f: self._discard(event, key, f))
+
+    def _discard(self, event, key, future):
+        buckets = self._events.get(event)
+        if buckets is None:
+            return
+        bucket = buckets.get(key)
+        if bucket is None:
+            return
+        bucket.pop(future, None)
+        if not bucket:
+            del buckets[key]
+            if not buckets:
+                del self._events[event]
+
+    def dispatch(self, event, args, chat_id=None, owner_id=None):
+        buckets = self._events.get(event)
+        if not buckets:
+            return
+        keys = [(None, None)]
+        if chat_id is not None:
+            keys.append((chat_id, None))
+        if owner_id is not None:
+            keys.append((None, owner_id))
+            if chat_id is not None:
+                keys.append((chat_id, owner_id))
+        result = args[0] if len(args) == 1 else args
+        for key in keys:
+            bucket = buckets.get(key)
+            if not bucket:
+                continue
+            for future, check in list(bucket.items()):
+                if future.done():
+                    continue
+                try:
+                    if check is None or check(*args):
+                        future.set_result(result)
+                except Exception:
+                    continue
@@ -0,0 +1,42 @@
+import asyncio
+
+import slchat
+from slchat.testing import LocalServer, wait_until
+
+
+def run(coro, timeout=30):
+    async def main():
+        return await asyncio.wait_for(coro, timeout)
+    return asyncio.run(main())
+
+
+def populate(server, servers=("s1",), dms=(), members=("alice",)):
+    server.add_user("bot", bot=True)
+    for user_id in members:
+        server.add_user(user_id)
+    for server_id in servers:
+        server.add_server(server_id, members=["bot", *members])
+    for dm_id in dms:
+        server.add_dm(dm_id, members=["bot", members[0]])
+
+
+async def start_bot(server, setup=None, **kwargs):
+    bot = slchat.Bot(prefix="!", base_url=server.base_url, **kwargs)
+    ready = asyncio.Event()
+
+    @bot.event
+    async def on_ready():
+        ready.set()
+
+    if setup is not None:
+        setup(bot)
+    task = asyncio.ensure_future(bot.run("token", "bot"))
+    await wait_until(lambda: ready.is_set() or task.done())
+    if task.done():
+        task.result()
+    return bot, task
+
+
+async def stop_bot(bot, task):
+    await bot.close()
+    await task
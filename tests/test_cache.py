@@ -0,0 +1,83 @@
+import asyncio
+
+from slchat.cache import UserCache
+from slchat.models import Members
+from slchat.testing import LocalServer, wait_until
+
+from tests.helpers import populate, run, start_bot, stop_bot
+
+
+def user(user_id, name=None):
+    return {"id": user_id, "name": name or user_id, "avatar": "", "status": "online", "badges": [], "servers": [], "dms": []}
+
+
+def test_expired_user_is_a_miss_but_keeps_identity():
+    async def scenario():
+        cache = UserCache(ttl=0.05)
+        alice = cache.intern(user("alice"))
+        members = Members([alice])
+        await asyncio.sleep(0.1)
+        assert cache.get("alice") is None
+        assert cache.get("alice") is None
+        refreshed = cache.intern(user("alice", "Alice"))
+        assert refreshed is alice and members.get("alice").name == "Alice"
+        assert cache.get("alice") is alice
+
+    run(scenario())
+
+
+def test_fetch_user_refreshes_after_ttl():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            bot, task = await start_bot(server, user_cache_ttl=0.2)
+            await wait_until(lambda: "users" in bot.get_server("s1"))
+            member = bot.get_members("s1").get("alice")
+            assert (await bot.fetch_user("alice")) is member
+            server.users["alice"]["name"] = "Alice"
+            await asyncio.sleep(0.3)
+            assert bot.get_user("alice") is None
+            fetched = await bot.fetch_user("alice")
+            assert fetched is member and member.name == "Alice"
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_leaving_last_server_keeps_dm_member_identity():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server, dms=("d1",))
+            bot, task = await start_bot(server)
+            await wait_until(lambda: "users" in bot.get_server("s1") and "users" in bot.get_dm("d1"))
+            member = bot.get_dm("d1").users.get("alice")
+            await server.remove_member("s1", "alice")
+            await wait_until(lambda: "alice" not in bot.get_members("s1"))
+            assert bot._users.intern(server.users["alice"]) is member
+            assert bot.get_user("alice") is member
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_added_and_fetched_servers_share_interned_members():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            server.add_user("carol")
+            server.servers["s9"] = {"id": "s9", "name": "s9", "icon": "", "owner": None,
+                                    "users": [server.users["alice"], server.users["carol"]]}
+            bot, task = await start_bot(server, lazy_chats=("server",))
+            await server.emit_user("bot", "server_add", {"id": "s2", "name": "s2", "icon": "", "owner": None,
+                                                         "users": [server.users["alice"], server.users["carol"]]})
+            await wait_until(lambda: bot.get_server("s2") is not None)
+            alice, carol = bot.get_user("alice"), bot.get_user("carol")
+            assert bot.get_members("s2").get("alice") is alice and bot.get_members("s2").get("carol") is carol
+            assert bot.is_member("carol", "s2") and bot.is_member("alice", "s2")
+
+            fetched = await bot.fetch_server("s9")
+            assert fetched.users.get("alice") is alice and fetched.users.get("carol") is carol
+            assert {chat.id for chat in bot.mutual_servers("carol")} == {"s2", "s9"}
+            await stop_bot(bot, task)
+
+    run(scenario())
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from slchat.sharding import HashRing
+from slchat.testing import LocalServer, wait_until
+
+from tests.helpers import populate, run, start_bot, stop_bot
+
+
+def replies(server, chat_id):
+    return [message["text"] for message in server.messages.values() if message["chat"] == chat_id and message["owner"] == "bot"]
+
+
+@pytest.mark.parametrize("pool_size", [None, 2])
+def test_command_round_trip(pool_size):
+    async def scenario():
+        async with LocalServer(escape=False) as server:
+            populate(server, servers=("s1", "s2"))
+            bot, task = await start_bot(server, pool_size=pool_size)
+
+            @bot.command()
+            async def echo(ctx, *, text):
+                await ctx.send(text)
+
+            await wait_until(lambda: bot.connections.is_ready("s1") and bot.connections.is_ready("s2"))
+            await server.send_message("s1", "alice", "!echo hello there")
+            await server.send_message("s2", "alice", "!echo second")
+            await wait_until(lambda: replies(server, "s1") and replies(server, "s2"))
+            assert replies(server, "s1") == ["hello there"]
+            assert replies(server, "s2") == ["second"]
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_user_socket_reconnect_resyncs():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server, servers=("s1", "s2"))
+            removed = []
+            reconnected = asyncio.Event()
+
+            def setup(bot):
+                @bot.event
+                async def on_server_remove(guild):
+                    removed.append(guild.id)
+
+                @bot.event
+                async def on_reconnect():
+                    reconnected.set()
+
+            bot, task = await start_bot(server, setup, reconnect_delay=0.05, reconnect_jitter=0)
+            original = bot.get_server("s1")
+            server.members["s2"].remove("bot")
+            server.users["bot"]["servers"].remove("s2")
+            server.add_server("s3", members=["bot", "alice"])
+            server.servers["s1"]["name"] = "renamed"
+            for sid in list(server.user_sids["bot"]):
+                await server.sio.disconnect(sid, namespace="/user")
+            await asyncio.wait_for(reconnected.wait(), 5)
+            assert removed == ["s2"]
+            assert bot.get_server("s1") is original and original.name == "renamed"
+            await wait_until(lambda: bot.connections.is_ready("s3"))
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_lazy_dm_wakes_on_send_and_hibernates():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server, dms=("d1",))
+            bot, task = await start_bot(server, lazy_chats=("dm",), idle_timeout=0.2)
+            assert "d1" not in bot.connections
+            result = await bot.send("hi", "d1")
+            assert result is not None and result.text == "hi"
+            await wait_until(lambda: "d1" not in bot.connections, timeout=5)
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_broadcast_reports_each_target():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server, servers=("s1", "s2"))
+            bot, task = await start_bot(server)
+            await wait_until(lambda: bot.connections.is_ready("s1") and bot.connections.is_ready("s2"))
+            results = {result.target: result.status for result in await bot.broadcast("news", ["s1", "s2", "missing"])}
+            assert results == {"s1": "ok", "s2": "ok", "missing": "error"}
+
+            sent = [result.value.id for result in await bot.broadcast("x", ["s1"] * 3)]
+            deleted = [result.status async for result in bot.bulk_delete("s1", sent)]
+            assert deleted == ["ok"] * 3
+            await wait_until(lambda: not [message for message in server.messages.values() if message["text"] == "x"])
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_message_cache_tracks_edits_and_deletes():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            bot, task = await start_bot(server, message_cache_size=2)
+            await wait_until(lambda: bot.connections.is_ready("s1"))
+            ids = [(await server.send_message("s1", "alice", f"m{index}"))["id"] for index in range(3)]
+            await wait_until(lambda: bot.get_message("s1", ids[-1]) is not None)
+            assert bot.get_message("s1", ids[0]) is None
+            await server.edit_message(ids[2], "edited")
+            await server.delete_message(ids[1])
+            await wait_until(lambda: bot.get_message("s1", ids[1]) is None)
+            assert [ctx.text for ctx in bot.history("s1")] == ["edited"]
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_hash_ring_is_stable():
+    ring = HashRing(4)
+    owners = {chat_id: ring.shard_for(chat_id) for chat_id in (f"chat{index}" for index in range(200))}
+    assert set(owners.values()) == {0, 1, 2, 3}
+    assert all(HashRing(4).shard_for(chat_id) == shard for chat_id, shard in owners.items())
+    assert sum(HashRing(4).filter(0)(chat_id) for chat_id in owners) == list(owners.values()).count(0)
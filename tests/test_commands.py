@@ -0,0 +1,138 @@
+import pytest
+
+from slchat.classes import Context, Converter, UserConverter, register_converter
+from slchat.classes.command import Signature
+from slchat.models import User
+from slchat.testing import LocalServer, wait_until
+
+from tests.helpers import populate, run, start_bot, stop_bot
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Upper(Converter):
+    def convert(self, ctx, argument):
+        return argument.upper()
+
+
+def test_signature_binds_positional_and_variadic():
+    async def add(ctx, a: int, b: int = None, *rest: float):
+        pass
+
+    signature = Signature(add)
+    assert signature.bind(None, "1", "add") == ([1, None], {})
+    assert signature.bind(None, "1 2 3.5 4", "add") == ([1, 2, 3.5, 4.0], {})
+    with pytest.raises(ValueError, match="Missing arguments"):
+        signature.bind(None, "", "add")
+    with pytest.raises(ValueError, match="Argument 'a' expected int, got 'x'"):
+        signature.bind(None, "x", "add")
+
+
+def test_signature_binds_keyword_arguments():
+    async def ban(ctx, user, *, reason="none", days: int = 0):
+        pass
+
+    signature = Signature(ban)
+    assert signature.bind(None, "bob days=3 spamming links", "ban") == (["bob"], {"days": 3, "reason": "spamming links"})
+    assert signature.bind(None, "bob", "ban") == (["bob"], {"reason": "none", "days": 0})
+
+
+def test_rest_excludes_positional_arguments():
+    async def remind(ctx, minutes: int, *, text):
+        pass
+
+    signature = Signature(remind)
+    assert signature.rest
+    assert signature.bind(None, "10  take   out the bin", "remind") == ([10], {"text": "take out the bin"})
+    with pytest.raises(ValueError, match="Missing required keyword-only argument"):
+        signature.bind(None, "10", "remind")
+
+
+def test_rest_accepts_unmatched_apostrophe():
+    async def say(ctx, *, text):
+        pass
+
+    assert Signature(say).bind(None, "it's a 'quoted' word", "say") == ([], {"text": "it's a 'quoted' word"})
+
+
+def test_rest_keyword_matches_anywhere():
+    async def say(ctx, *, text):
+        pass
+
+    signature = Signature(say)
+    assert signature.bind(None, "text=hello", "say") == ([], {"text": "hello"})
+    assert signature.bind(None, "please use text=hello", "say") == ([], {"text": "hello"})
+    assert signature.bind(None, 'text="hello world"', "say") == ([], {"text": "hello world"})
+    assert signature.bind(None, "context=hello", "say") == ([], {"text": "context=hello"})
+
+
+def test_register_converter():
+    register_converter(Point, lambda ctx, argument: Point(*map(int, argument.split(","))))
+
+    async def move(ctx, point: Point, *, label: Upper):
+        pass
+
+    args, kwargs = Signature(move).bind(None, "3,4 home base", "move")
+    assert (args[0].x, args[0].y) == (3, 4)
+    assert kwargs == {"label": "HOME BASE"}
+
+
+def test_user_converter_resolves_cached_users():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            seen = []
+            errors = []
+
+            def setup(bot):
+                @bot.command()
+                async def whois(ctx, user: User):
+                    seen.append(user)
+
+                @bot.event
+                async def on_error(error, context):
+                    errors.append(str(error))
+
+            bot, task = await start_bot(server, setup)
+            await wait_until(lambda: bot.connections.is_ready("s1"))
+            await server.send_message("s1", "alice", "!whois @alice")
+            await server.send_message("s1", "alice", "!whois nobody")
+            await wait_until(lambda: seen and errors)
+            assert seen == [bot.get_user("alice")]
+            assert errors == ["User 'nobody' not found"]
+            assert UserConverter().convert(Context({}, "s1", bot), "alice") is seen[0]
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_argument_errors_go_through_on_error():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            calls = []
+            errors = []
+
+            def setup(bot):
+                @bot.command()
+                async def remind(ctx, minutes: int, *, text):
+                    calls.append((minutes, text))
+
+                @bot.event
+                async def on_error(error, context):
+                    errors.append((str(error), context))
+
+            bot, task = await start_bot(server, setup)
+            await wait_until(lambda: bot.connections.is_ready("s1"))
+            await server.send_message("s1", "alice", "!remind soon it's late")
+            await server.send_message("s1", "alice", "!remind 5 it's late")
+            await wait_until(lambda: calls and errors)
+            assert errors == [("Argument 'minutes' expected int, got 'soon'", "process_command")]
+            assert calls == [(5, "it's late")]
+            await stop_bot(bot, task)
+
+    run(scenario())
@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from slchat import Cooldown
+
+
+def context(owner_id="alice", chat_id="s1"):
+    return SimpleNamespace(owner_id=owner_id, chat_id=chat_id)
+
+
+def test_cooldown_window_is_per_key():
+    cooldown = Cooldown(1, 60)
+    ctx = context()
+    assert cooldown.retry_after(ctx, 119.9) == 0
+    cooldown.consume(ctx, 119.9)
+    assert cooldown.retry_after(ctx, 120.01) == 119.9 + 60 - 120.01
+    assert cooldown.retry_after(context("bob"), 120.01) == 0
+    assert cooldown.retry_after(ctx, 179.9) == 0
+
+
+def test_cooldown_rate_and_buckets():
+    cooldown = Cooldown(2, 10, "chat")
+    cooldown.consume(context("alice"), 0)
+    cooldown.consume(context("bob"), 1)
+    assert cooldown.retry_after(context("carol"), 2) == 8
+    assert cooldown.retry_after(context("carol", "s2"), 2) == 0
+
+
+def test_cooldown_prunes_expired_keys():
+    cooldown = Cooldown(1, 10)
+    for index in range(1000):
+        cooldown.consume(context(f"user{index}"), index / 1000)
+    assert len(cooldown) == 1000
+    cooldown.consume(context("late"), 11)
+    assert len(cooldown) == 1
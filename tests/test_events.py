@@ -0,0 +1,156 @@
+import asyncio
+
+from slchat.testing import LocalServer, wait_until
+
+from tests.helpers import populate, run, start_bot, stop_bot
+
+
+def test_wait_for_inside_command_sees_reply():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            bot, task = await start_bot(server)
+            replies = []
+
+            @bot.command()
+            async def confirm(ctx):
+                reply = await bot.wait_for("message", check=lambda message: message.owner_id == ctx.owner_id,
+                                           timeout=5, chat_id=ctx.chat_id)
+                replies.append(reply.text)
+
+            await wait_until(lambda: bot.connections.is_ready("s1"))
+            await server.send_message("s1", "alice", "!confirm")
+            await server.send_message("s1", "alice", "yes")
+            await wait_until(lambda: replies)
+            assert replies == ["yes"]
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_wait_for_edit_inside_handler():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            edits = []
+
+            def setup(bot):
+                @bot.event
+                async def on_message(ctx):
+                    edited = await bot.wait_for("message_edit", check=lambda edit: edit.id == ctx.id, timeout=5)
+                    edits.append((edited.before, edited.text))
+
+            bot, task = await start_bot(server, setup)
+            await wait_until(lambda: bot.connections.is_ready("s1"))
+            message = await server.send_message("s1", "alice", "first")
+            await server.edit_message(message["id"], "second")
+            await wait_until(lambda: edits)
+            assert edits == [("first", "second")]
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_lazy_chat_add_fires_join_events():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            joined = []
+
+            def setup(bot):
+                @bot.event
+                async def on_dm_join(dm):
+                    joined.append(("dm", dm.id))
+
+                @bot.event
+                async def on_server_join(guild):
+                    joined.append(("server", guild.id))
+
+            bot, task = await start_bot(server, setup, lazy_chats=("dm", "server"))
+            server.add_dm("d1", members=["bot", "alice"])
+            server.add_server("s2", members=["bot", "alice"])
+            await server.emit_user("bot", "dm_add", server.dms["d1"])
+            await server.emit_user("bot", "server_add", server.servers["s2"])
+            await wait_until(lambda: len(joined) == 2)
+            assert sorted(joined) == [("dm", "d1"), ("server", "s2")]
+            assert "d1" not in bot.connections and "s2" not in bot.connections
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_ready_waits_for_priority_chats_to_connect():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server, servers=("s1", "s2", "s3"))
+            server.members["s2"].remove("bot")
+            failures = []
+
+            def setup(bot):
+                @bot.event
+                async def on_join_failed(chat_ids):
+                    failures.append(sorted(chat_ids))
+
+            bot, task = await start_bot(server, setup, ready_chats=("s1", "s2"), reconnect=False)
+            assert failures == [["s2"]]
+            assert "s1" in bot.connections and "s3" in bot.connections
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_lazy_dm_notification_burst_delivers_every_message():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server, dms=("d1",))
+            received = []
+
+            def setup(bot):
+                @bot.event
+                async def on_message(ctx):
+                    received.append(ctx.text)
+
+            bot, task = await start_bot(server, setup, lazy_chats=("dm",))
+            for text in ("one", "two", "three"):
+                await server.send_message("d1", "alice", text)
+            await wait_until(lambda: len(received) == 3)
+            await server.send_message("d1", "alice", "four")
+            await wait_until(lambda: len(received) == 4)
+            await asyncio.sleep(0.1)
+            assert received == ["one", "two", "three", "four"]
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_unhandled_messages_skip_scheduler():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            pings = []
+
+            def setup(bot):
+                @bot.command()
+                async def ping(ctx):
+                    pings.append(ctx.owner_id)
+
+            bot, task = await start_bot(server, setup)
+            submitted = []
+            submit = bot.scheduler.submit
+
+            async def counted_submit(chat_id, priority, func, message, *args):
+                submitted.append(message["text"])
+                return await submit(chat_id, priority, func, message, *args)
+
+            bot.scheduler.submit = counted_submit
+            await wait_until(lambda: bot.connections.is_ready("s1"))
+            hello = await server.send_message("s1", "alice", "hello")
+            await bot.send("echo", "s1")
+            await server.send_message("s1", "bot", "!ping")
+            await server.send_message("s1", "alice", "!ping")
+            await wait_until(lambda: pings)
+            assert submitted == ["!ping"] and pings == ["alice"]
+            assert bot.message_cache.get("s1", hello["id"]) is not None
+            await stop_bot(bot, task)
+
+    run(scenario())
@@ -0,0 +1,101 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from slchat.http import HTTPClient
+from slchat.testing import LocalServer
+
+from tests.helpers import run
+
+
+def counting_server(handler):
+    server = LocalServer()
+    hits = []
+
+    async def route(request):
+        hits.append(request.path)
+        return await handler(request, len(hits))
+
+    server.app.router.add_get("/api/test/{name}", route)
+    return server, hits
+
+
+def test_concurrent_gets_share_one_request():
+    async def handler(request, count):
+        await asyncio.sleep(0.1)
+        return web.json_response({"name": request.match_info["name"], "count": count})
+
+    async def scenario():
+        server, hits = counting_server(handler)
+        async with server:
+            client = HTTPClient(server.base_url)
+            client.start("token", "bot")
+            results = await asyncio.gather(*(client.get("/api/test/alice") for _ in range(5)))
+            assert results == [{"name": "alice", "count": 1}] * 5
+            assert hits == ["/api/test/alice"]
+            await client.get("/api/test/alice")
+            assert len(hits) == 2
+            await client.close()
+
+    run(scenario())
+
+
+def test_not_found_is_cached_until_ttl():
+    async def handler(request, count):
+        raise web.HTTPNotFound()
+
+    async def scenario():
+        server, hits = counting_server(handler)
+        async with server:
+            client = HTTPClient(server.base_url, negative_ttl=0.2)
+            client.start("token", "bot")
+            assert await client.get("/api/test/ghost") is None
+            assert await client.get("/api/test/ghost") is None
+            assert len(hits) == 1
+            client.forget("/api/test/ghost")
+            assert await client.get("/api/test/ghost") is None
+            assert len(hits) == 2
+            await asyncio.sleep(0.25)
+            assert await client.get("/api/test/ghost") is None
+            assert len(hits) == 3
+            await client.close()
+
+    run(scenario())
+
+
+def test_server_errors_are_retried():
+    async def handler(request, count):
+        if count < 3:
+            return web.Response(status=503, headers={"Retry-After": "0.05"})
+        return web.json_response({"count": count})
+
+    async def scenario():
+        server, hits = counting_server(handler)
+        async with server:
+            client = HTTPClient(server.base_url, retries=3, backoff=60)
+            client.start("token", "bot")
+            assert await asyncio.wait_for(client.get("/api/test/flaky"), 5) == {"count": 3}
+            assert len(hits) == 3
+            await client.close()
+
+    run(scenario())
+
+
+def test_retries_are_bounded():
+    async def handler(request, count):
+        return web.Response(status=500)
+
+    async def scenario():
+        server, hits = counting_server(handler)
+        async with server:
+            client = HTTPClient(server.base_url, retries=2, backoff=0.01)
+            client.start("token", "bot")
+            with pytest.raises(aiohttp.ClientResponseError) as error:
+                await client.get("/api/test/broken")
+            assert error.value.status == 500
+            assert len(hits) == 3
+            await client.close()
+
+    run(scenario())
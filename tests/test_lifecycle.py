@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+import slchat
+from slchat.testing import LocalServer
+
+from tests.helpers import populate, run, start_bot
+
+
+def test_close_twice_is_safe():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            for _ in range(3):
+                bot, task = await start_bot(server, thread_workers=1, process_workers=1)
+                bot.executor.threads()
+                bot.executor.processes()
+                closes = 0
+                close_http = bot.http.close
+
+                async def counted_close():
+                    nonlocal closes
+                    closes += 1
+                    await close_http()
+
+                bot.http.close = counted_close
+                await asyncio.gather(bot.close(), bot.close())
+                await task
+                await bot.close()
+                assert closes == 1
+                assert bot.executor._threads is None and bot.executor._processes is None
+
+    run(scenario(), timeout=60)
+
+
+def test_failed_connect_closes_bot():
+    async def scenario():
+        async with LocalServer() as server:
+            base_url = server.base_url
+        bot = slchat.Bot(prefix="!", base_url=base_url, reconnect=False, slow_handler_threshold=1)
+        with pytest.raises(RuntimeError):
+            await bot.run("token", "bot")
+        assert bot.http.session is None and bot.user_socket is None
+        assert not bot.watchdog.running
+
+    run(scenario())
@@ -0,0 +1,107 @@
+import asyncio
+
+from slchat.classes import Context
+from slchat.ratelimit import PendingSends, SendScheduler
+from slchat.testing import LocalServer, wait_until
+
+from tests.helpers import populate, run, start_bot, stop_bot
+
+
+def test_forget_fails_queued_sends_and_keeps_pumping():
+    async def scenario():
+        scheduler = SendScheduler(rate=20, burst=1)
+        await scheduler.acquire("a")
+        await scheduler.acquire("b")
+        removed = [asyncio.ensure_future(scheduler.acquire("a")) for _ in range(3)]
+        kept = [asyncio.ensure_future(scheduler.acquire("b")) for _ in range(2)]
+        await asyncio.sleep(0)
+        scheduler.forget("a")
+        results = await asyncio.gather(*removed, return_exceptions=True)
+        assert all(isinstance(result, ConnectionError) for result in results)
+        await asyncio.wait_for(asyncio.gather(*kept), 2)
+        assert "a" not in scheduler.queues and "a" not in scheduler.ready
+        await asyncio.wait_for(scheduler.acquire("a"), 2)
+        await asyncio.wait_for(scheduler.acquire("a"), 2)
+
+    run(scenario())
+
+
+def test_forget_keeps_new_in_flight_counts_accurate():
+    async def scenario():
+        pending = PendingSends(window=4, timeout=5)
+        old = [await pending.reserve("a") for _ in range(2)]
+        pending.forget("a")
+        temp_id, future = await pending.reserve("a")
+        assert pending.in_flight("a") == 1
+        for old_temp, _ in old:
+            pending.resolve(old_temp, {})
+        await asyncio.sleep(0)
+        assert pending.in_flight("a") == 1
+        pending.resolve(temp_id, {})
+        await asyncio.sleep(0)
+        assert pending.in_flight("a") == 0 and len(pending) == 0
+
+    run(scenario())
+
+
+def test_rate_limit_wait_does_not_count_against_send_timeout():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server)
+            bot, task = await start_bot(server, send_rate=2, send_burst=1, send_timeout=1, send_window=8)
+            await wait_until(lambda: bot.connections.is_ready("s1"))
+            results = await asyncio.gather(*(bot.send(f"m{index}", "s1") for index in range(5)))
+            assert [result.text if result is not None else None for result in results] == [f"m{index}" for index in range(5)]
+            await stop_bot(bot, task)
+
+    run(scenario())
+
+
+def test_send_window_is_held_until_confirmation():
+    async def scenario():
+        pending = PendingSends(window=1, timeout=0.05)
+        temp_id, future = await pending.reserve("a")
+        await asyncio.sleep(0.1)
+        assert not future.done() and pending.in_flight("a") == 1
+        second = asyncio.ensure_future(pending.reserve("a"))
+        await asyncio.sleep(0.01)
+        assert not second.done()
+        pending.arm(temp_id)
+        assert await future is None
+        await asyncio.wait_for(second, 1)
+
+    run(scenario())
+
+
+def test_global_rate_interleaves_chats():
+    async def scenario():
+        scheduler = SendScheduler(rate=1000, burst=100, global_rate=20)
+        order = []
+
+        async def send(chat_id, index):
+            await scheduler.acquire(chat_id)
+            order.append(f"{chat_id}{index}")
+
+        await asyncio.gather(*(send("a", index) for index in range(10)), *(send("b", index) for index in range(3)))
+        assert order[:7] == ["a0", "a1", "b0", "a2", "b1", "a3", "b2"]
+
+    run(scenario())
+
+
+def test_removing_chat_with_queued_sends():
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server, servers=("s1", "s2"))
+            bot, task = await start_bot(server, send_rate=5, send_burst=1)
+            await wait_until(lambda: bot.connections.is_ready("s1") and bot.connections.is_ready("s2"))
+            removed = [asyncio.ensure_future(bot.send(f"a{index}", "s1")) for index in range(4)]
+            kept = [asyncio.ensure_future(bot.send(f"b{index}", "s2")) for index in range(3)]
+            await wait_until(lambda: bot.send_queue_depth("s1") and bot.send_queue_depth("s2"))
+            await server.emit_user("bot", "server_remove", "s1")
+            await wait_until(lambda: "s1" not in bot._servers)
+            assert all(isinstance(result, Context) for result in await asyncio.wait_for(asyncio.gather(*kept), 5))
+            await asyncio.wait_for(asyncio.gather(*removed), 5)
+            assert bot.send_queue_depth("s1") == 0
+            await stop_bot(bot, task)
+
+    run(scenario())
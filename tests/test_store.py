@@ -0,0 +1,52 @@
+import os
+
+from slchat.store import StateStore
+from slchat.testing import LocalServer, wait_until
+
+from tests.helpers import populate, run, start_bot, stop_bot
+
+
+def test_state_saved_on_close_without_periodic_snapshots(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server, dms=("d1",))
+            bot, task = await start_bot(server, state_path=path, snapshot_interval=0)
+            await wait_until(lambda: "users" in bot.get_server("s1"))
+            assert bot._snapshotter is None
+            await stop_bot(bot, task)
+
+    run(scenario())
+    assert os.path.exists(path)
+    state = StateStore(path).load()
+    assert [server["id"] for server in state["servers"]] == ["s1"]
+    assert [dm["id"] for dm in state["dms"]] == ["d1"]
+    assert {user["id"] for user in state["users"]} >= {"bot", "alice"}
+
+
+def test_restored_state_is_available_before_connect(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def scenario():
+        async with LocalServer() as server:
+            populate(server, servers=("s1", "s2"))
+            bot, task = await start_bot(server, state_path=path)
+            await wait_until(lambda: all("users" in bot.get_server(server_id) for server_id in ("s1", "s2")))
+            await stop_bot(bot, task)
+
+            server.members["s2"].remove("bot")
+            server.users["bot"]["servers"].remove("s2")
+            restored = []
+
+            def setup(bot):
+                @bot.event
+                async def on_connect():
+                    restored.append((sorted(bot._servers), bot.get_user("alice") is not None))
+
+            bot, task = await start_bot(server, setup, state_path=path)
+            assert restored == [(["s1", "s2"], True)]
+            assert sorted(bot._servers) == ["s1"]
+            await stop_bot(bot, task)
+
+    run(scenario())
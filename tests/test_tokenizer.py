@@ -0,0 +1,55 @@
+import shlex
+
+import pytest
+
+from slchat.tokenizer import TokenizeError, next_token, rest, split
+
+
+SAMPLES = [
+    "",
+    "   ",
+    "ping",
+    "ban 1234567890 spamming in general",
+    'say "hello world" to everyone',
+    "quote 'single quoted' and \"double \\\" quoted\"",
+    "glued'single'\"double\"bare",
+    "escaped\\ space and \\\\ backslash",
+    "tabs\tand\nnewlines\r\nmixed",
+    'empty "" and \'\' tokens',
+    "unicode café  nbsp 　wide",
+]
+
+INVALID = [
+    "it's unmatched",
+    'say "unclosed',
+    "trailing backslash \\",
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_split_matches_shlex(text):
+    assert split(text) == shlex.split(text)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_next_token_matches_shlex(text):
+    tokens = []
+    token, pos = next_token(text)
+    while token is not None:
+        tokens.append(token)
+        token, pos = next_token(text, pos)
+    assert tokens == shlex.split(text)
+
+
+@pytest.mark.parametrize("text", INVALID)
+def test_invalid_quoting_raises_like_shlex(text):
+    with pytest.raises(ValueError) as expected:
+        shlex.split(text)
+    with pytest.raises(TokenizeError) as error:
+        split(text)
+    assert str(error.value) == str(expected.value)
+
+
+def test_rest_falls_back_on_invalid_quoting():
+    assert rest("it's  a   test") == "it's a test"
+    assert rest('"hello   world"  again') == "hello   world again"